@@ -0,0 +1,124 @@
+import io
+import threading
+
+import streamlit as st
+
+from categories_utils import CategoriesUtils
+from transaction_manager import TransactionManager
+from budget_manager import BudgetManager
+from query_router import QueryRouter
+from job_scheduler import JobScheduler, FAILED
+
+CHATBOT_LOADING = "loading"
+CHATBOT_READY = "ready"
+CHATBOT_FAILED = "failed"
+
+class AppCore:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.index_lock = threading.Lock()
+        self.ingest_lock = threading.Lock()
+        self.categories_utils = CategoriesUtils()
+        self.budget_manager = BudgetManager()
+        self.transaction_manager = TransactionManager(self.categories_utils.get_categorizer())
+        self.data_manager = None
+        self.chatbot_manager = None
+        self.index_stale = True
+        self.index_job = None
+        self.jobs = JobScheduler()
+
+    def add_uploaded_transactions(self, uploaded_file, on_progress = None):
+        # Uploads are ingested one at a time so each dedups against the last; the app lock
+        # stays free for the script thread, and the transaction manager locks only its swap.
+        with self.ingest_lock:
+            report = self.transaction_manager.ingest_transactions_stream(
+                uploaded_file,
+                self.categories_utils.get_categorizer(),
+                on_progress = on_progress,
+                executor = self.jobs.processes()
+            )
+        if report.new:
+            self.invalidate_index()
+        return report
+
+    def submit_upload(self, uploaded_file):
+        # The uploader's buffer belongs to the script run, so the job gets its own copy.
+        file = io.BytesIO(uploaded_file.getvalue())
+        file.name = uploaded_file.name
+        return self.jobs.submit("ingest", self.add_uploaded_transactions, file, report_progress = True)
+
+    def apply_category_changes(self, changes):
+        with self.lock:
+            self.categories_utils.learn_keywords(changes["Description"], changes["Category"])
+            self.categories_utils.save_categories()
+        self.transaction_manager.update_expense_categories(changes)
+        self.invalidate_index()
+        return self.schedule_save()
+
+    def schedule_save(self):
+        # Edits made while a save is still queued are picked up by that same save.
+        return self.jobs.submit("save", self.save_transactions, key = "save")
+
+    def save_transactions(self):
+        self.transaction_manager.save_transactions()
+
+    def invalidate_index(self):
+        with self.lock:
+            self.index_stale = True
+
+    def assistant_requested(self):
+        # The chat stack is only built once someone starts the assistant or sends a message.
+        with self.lock:
+            return self.chatbot_manager is not None or self.index_job is not None
+
+    def warm_up_chatbot(self):
+        # Builds the chat stack off the script thread so the chat tab stays responsive meanwhile.
+        with self.lock:
+            # After a failure the next chat message retries in the foreground instead.
+            if not self.index_stale or (self.index_job is not None and self.index_job.status == FAILED):
+                return
+            self.index_job = self.jobs.submit("index", self.get_chatbot_manager, key = "index")
+
+    @property
+    def warmup_error(self):
+        return self.index_job.error if self.index_job is not None else None
+
+    def chatbot_status(self):
+        with self.lock:
+            if self.index_job is not None and self.index_job.status == FAILED:
+                return CHATBOT_FAILED
+            if self.chatbot_manager is not None and not self.index_stale:
+                return CHATBOT_READY
+            return CHATBOT_LOADING
+
+    def get_chatbot_manager(self):
+        with self.index_lock:
+            with self.lock:
+                if not self.index_stale:
+                    return self.chatbot_manager
+                transactions_df = self.transaction_manager.transactions
+                budgets = self.budget_manager.get_all_budgets()
+                self.index_stale = False
+
+            # The LLM and vector stack are imported on first use; they dominate cold start otherwise.
+            from data_manager import DataManager
+            from chatbot_manager import ChatbotManager
+
+            try:
+                if self.data_manager is None:
+                    self.data_manager = DataManager(transactions_df, budgets)
+                    self.chatbot_manager = ChatbotManager(
+                        self.data_manager.get_retriever(),
+                        query_router = QueryRouter(self.transaction_manager, self.budget_manager)
+                    )
+                else:
+                    self.data_manager.refresh(transactions_df, budgets)
+            except Exception:
+                self.invalidate_index()
+                raise
+            self.index_job = None
+            return self.chatbot_manager
+
+@st.cache_resource
+def get_app_core():
+    return AppCore()
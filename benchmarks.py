@@ -0,0 +1,340 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from budget_engine import BudgetEngine
+from budget_manager import BudgetManager
+from categorizer import Categorizer
+from transaction_manager import TransactionManager
+from transaction_store import TransactionStore, compact_transactions
+from synthetic_statements import write_statements, synthetic_budgets
+
+IMPORT_BUDGET_S = 2.0
+FIRST_PAINT_BUDGET_S = 3.0
+LAZY_MODULES = ["langchain", "langchain_community", "chromadb", "ollama"]
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(APP_DIR, "benchmark_results.jsonl")
+STUB_BACKEND = "stub"
+STUB_EMBEDDING_DIM = 64
+STARTUP_SEED_ROWS = 2_000
+STARTUP_SEED_CATEGORIES = 10
+LAZY_IMPORT_GRACE_S = 1.0
+SUITE_QUESTIONS = [
+    "How much did I spend in total?",
+    "What are my top 5 categories?",
+    "Show transactions for Category 1",
+    "Am I over budget?",
+    "Why is my spending on fuel so high?",
+]
+
+COLD_IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import app_core, tracker_view
+print(json.dumps({"seconds": time.perf_counter() - start, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+FIRST_PAINT_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+app = AppTest.from_file(%r, default_timeout=60)
+app.run()
+seconds = time.perf_counter() - start
+# Give a background warm-up started by the paint time to import the chat stack.
+time.sleep(%r)
+print(json.dumps({
+    "seconds": seconds,
+    "exceptions": len(app.exception),
+    "tabs": len(app.tabs),
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+def bench_ingest_scaling(month_counts, rows_per_month, category_count):
+    results = []
+    for months in month_counts:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_dir = os.path.join(tmp_dir, "previous_transactions")
+            categories = write_statements(csv_dir, months * rows_per_month, category_count, months)
+
+            start = time.perf_counter()
+            TransactionManager(categories, TransactionStore(os.path.join(tmp_dir, "store")), csv_dir)
+            migrate_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            TransactionManager(categories, TransactionStore(os.path.join(tmp_dir, "store")), csv_dir)
+            startup_seconds = time.perf_counter() - start
+
+        results.append({
+            "files": months,
+            "rows": months * rows_per_month,
+            "csv_ingest_s": migrate_seconds,
+            "startup_s": startup_seconds,
+            "startup_ms_per_file": startup_seconds / months * 1000,
+        })
+    return pd.DataFrame(results)
+
+def bench_embedding(backend, model, doc_count, category_count, batch_sizes, concurrencies):
+    # Imported here so the ingest benchmarks run without the vector stack installed.
+    from data_manager import DataManager
+    from embedding_pipeline import EmbeddingPipeline, create_backend
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_statements(tmp_dir, doc_count, category_count, months=1)
+        transactions = compact_transactions(pd.concat(
+            [pd.read_csv(os.path.join(tmp_dir, name)) for name in os.listdir(tmp_dir)], ignore_index=True
+        ).assign(Category="Uncategorized"))
+    texts = [doc.page_content for doc in DataManager.transaction_documents(transactions)]
+
+    embedder = create_backend(backend, model)
+    embedder.embed(texts[:1])
+    results = []
+    for batch_size in batch_sizes:
+        for max_concurrency in concurrencies:
+            pipeline = EmbeddingPipeline(embedder, batch_size=batch_size, max_concurrency=max_concurrency)
+            pipeline.embed_documents(texts)
+            results.append({
+                "batch_size": batch_size,
+                "concurrency": max_concurrency,
+                "docs": pipeline.last_run.docs,
+                "seconds": pipeline.last_run.seconds,
+                "docs_per_s": pipeline.last_run.docs_per_second,
+            })
+    return pd.DataFrame(results)
+
+class StubEmbeddingBackend:
+    """Hashed bag-of-words vectors: deterministic, offline and cheap, so timings measure the pipeline."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), STUB_EMBEDDING_DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                vectors[row, int(hashlib.md5(token.encode("utf-8")).hexdigest()[:8], 16) % STUB_EMBEDDING_DIM] += 1.0
+        return vectors.tolist()
+
+def stub_chat(model, messages, stream=False):
+    content = f"Stub answer from {model} for a {len(messages[-1]['content'])} character prompt."
+    if stream:
+        return iter([{"message": {"content": word + " "}} for word in content.split()])
+    return {"message": {"content": content}}
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def bench_suite(rows, category_count, months, index_rows):
+    # Imported here so the ingest benchmarks run without the vector stack installed.
+    from chatbot_manager import ChatbotManager
+    from data_manager import DataManager
+    from embedding_cache import EmbeddingCache
+    from embedding_pipeline import EMBEDDING_BACKENDS
+    from query_router import QueryRouter
+
+    EMBEDDING_BACKENDS[STUB_BACKEND] = StubEmbeddingBackend
+    metrics = {}
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            csv_dir = os.path.join(tmp_dir, "statements")
+            categories, metrics["generate_s"] = timed(write_statements, csv_dir, rows, category_count, months)
+            categorizer = Categorizer(categories)
+            store = TransactionStore(os.path.join(tmp_dir, "store"))
+
+            _, metrics["first_load_s"] = timed(TransactionManager, categorizer, store, csv_dir)
+            transaction_manager, metrics["get_previous_transactions_s"] = timed(
+                TransactionManager, categorizer, store, csv_dir
+            )
+
+            metrics["categorize_s"] = 0.0
+            for name in sorted(os.listdir(csv_dir)):
+                cleaned = TransactionManager.clean_transactions(pd.read_csv(os.path.join(csv_dir, name)))
+                _, seconds = timed(TransactionManager.categorize_transactions, cleaned, categorizer)
+                metrics["categorize_s"] += seconds
+            metrics["categorize_rows_per_s"] = rows / metrics["categorize_s"]
+
+            available_months = transaction_manager.get_available_months()
+            transaction_manager.dirty_months.update(available_months)
+            _, metrics["save_s"] = timed(transaction_manager.save_transactions)
+
+            budgets = synthetic_budgets(categories)
+            budget_manager = BudgetManager(os.path.join(tmp_dir, "budgets"))
+            for name, budget in budgets.items():
+                budget_manager.save_budget(name, budget)
+            engine = BudgetEngine(transaction_manager.rollup)
+            start = time.perf_counter()
+            evaluation = engine.evaluate(budgets, available_months)
+            engine.monthly_trend(evaluation)
+            transaction_manager.load_expenses(available_months[-3:])
+            metrics["budget_aggregation_s"] = time.perf_counter() - start
+
+            indexed = transaction_manager.transactions.head(index_rows)
+            data_manager, metrics["index_s"] = timed(
+                DataManager,
+                indexed,
+                budgets,
+                embedding_backend=STUB_BACKEND,
+                embedding_model=f"stub-{STUB_EMBEDDING_DIM}",
+                embedding_cache=EmbeddingCache(os.path.join(tmp_dir, "embedding_cache.sqlite"))
+            )
+            metrics["index_docs"] = len(data_manager.documents)
+            metrics["index_docs_per_s"] = len(data_manager.documents) / metrics["index_s"]
+
+            chatbot_manager = ChatbotManager(
+                data_manager.get_retriever(),
+                query_router=QueryRouter(transaction_manager, budget_manager),
+                chat_fn=stub_chat
+            )
+            conversation = []
+            start = time.perf_counter()
+            for question in SUITE_QUESTIONS:
+                conversation.append({"role": "user", "content": question})
+                conversation.append({"role": "assistant", "content": chatbot_manager.ask(conversation)})
+            metrics["chat_s_per_question"] = (time.perf_counter() - start) / len(SUITE_QUESTIONS)
+        finally:
+            os.chdir(previous_dir)
+    return metrics
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def load_results(path=RESULTS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def record_result(params, metrics, path=RESULTS_PATH):
+    # Appended per run, so results from different commits can be compared with the same parameters.
+    previous = [result for result in load_results(path) if result["params"] == params]
+    result = {"commit": current_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "params": params, "metrics": metrics}
+    with open(path, "a") as f:
+        f.write(json.dumps(result) + "\n")
+    return previous[-1] if previous else None
+
+def compare_results(previous, metrics):
+    rows = [
+        {
+            "metric": name,
+            "current": value,
+            "previous": previous["metrics"].get(name) if previous else None,
+        }
+        for name, value in metrics.items()
+    ]
+    comparison = pd.DataFrame(rows)
+    comparison["ratio"] = comparison["current"] / comparison["previous"]
+    return comparison
+
+def run_fresh_interpreter(script, cwd=None):
+    # A new interpreter per measurement, so nothing is already imported or cached.
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True,
+        env={**os.environ, "PYTHONPATH": APP_DIR}, cwd=cwd
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def seed_app_dir(app_dir):
+    # The app reads its store, categories and budgets relative to the working directory; with data
+    # present the dashboard renders every tab, including the chatbot tab, on first paint.
+    csv_dir = os.path.join(app_dir, "statements")
+    categories = write_statements(csv_dir, STARTUP_SEED_ROWS, STARTUP_SEED_CATEGORIES)
+    with open(os.path.join(app_dir, "categories.json"), "w") as f:
+        json.dump(categories, f)
+    TransactionManager(
+        categories, TransactionStore(os.path.join(app_dir, "transaction_store")), os.path.join(app_dir, "previous_transactions")
+    ).add_transactions_batch([os.path.join(csv_dir, name) for name in sorted(os.listdir(csv_dir))], categories)
+    budget_manager = BudgetManager(os.path.join(app_dir, "budgets"))
+    for name, budget in synthetic_budgets(categories).items():
+        budget_manager.save_budget(name, budget)
+
+def bench_cold_start():
+    imports = run_fresh_interpreter(COLD_IMPORT_SCRIPT % LAZY_MODULES)
+    with tempfile.TemporaryDirectory() as app_dir:
+        seed_app_dir(app_dir)
+        first_paint = run_fresh_interpreter(
+            FIRST_PAINT_SCRIPT % (os.path.join(APP_DIR, "main.py"), LAZY_IMPORT_GRACE_S, LAZY_MODULES), cwd=app_dir
+        )
+    problems = []
+    if imports["seconds"] > IMPORT_BUDGET_S:
+        problems.append(f"import took {imports['seconds']:.2f}s, budget {IMPORT_BUDGET_S:.2f}s")
+    if imports["loaded"]:
+        problems.append(f"imported at startup but should be lazy: {', '.join(imports['loaded'])}")
+    if first_paint["seconds"] > FIRST_PAINT_BUDGET_S:
+        problems.append(f"first paint took {first_paint['seconds']:.2f}s, budget {FIRST_PAINT_BUDGET_S:.2f}s")
+    if first_paint["exceptions"]:
+        problems.append(f"first paint raised {first_paint['exceptions']} exception(s)")
+    if not first_paint["tabs"]:
+        problems.append("first paint did not render the dashboard tabs for the seeded store")
+    if first_paint["loaded"]:
+        problems.append(f"imported by first paint but should wait for the assistant: {', '.join(first_paint['loaded'])}")
+    return imports["seconds"], first_paint["seconds"], problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Finance tracker performance benchmarks")
+    parser.add_argument("--months", type=int, nargs="+", default=[12, 60, 120, 240])
+    parser.add_argument("--rows-per-month", type=int, default=300)
+    parser.add_argument("--embedding-backend", help="also measure embedding throughput with this backend")
+    parser.add_argument("--embedding-model")
+    parser.add_argument("--embedding-docs", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--check-startup", action="store_true", help="only check the import-time and first-paint budget")
+    parser.add_argument("--suite", action="store_true", help="run the end-to-end suite on synthetic statements")
+    parser.add_argument("--rows", type=int, default=100_000, help="suite: synthetic rows (1k to 10M)")
+    parser.add_argument("--categories", type=int, default=100, help="synthetic categories (10 to 1,000)")
+    parser.add_argument("--suite-months", type=int, default=12)
+    parser.add_argument("--index-rows", type=int, default=20_000, help="suite: rows embedded into the vector index")
+    parser.add_argument("--results", default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    if args.suite:
+        params = {"rows": args.rows, "categories": args.categories, "months": args.suite_months, "index_rows": args.index_rows}
+        metrics = bench_suite(args.rows, args.categories, args.suite_months, args.index_rows)
+        previous = record_result(params, metrics, args.results)
+        print(f"suite {params} at {current_commit()}" + (f", compared with {previous['commit']}" if previous else ""))
+        print(compare_results(previous, metrics).to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+        return
+
+    if args.check_startup:
+        import_seconds, first_paint_seconds, problems = bench_cold_start()
+        print(f"import: {import_seconds:.2f}s (budget {IMPORT_BUDGET_S:.2f}s)")
+        print(f"first paint: {first_paint_seconds:.2f}s (budget {FIRST_PAINT_BUDGET_S:.2f}s)")
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        sys.exit(1 if problems else 0)
+
+    results = bench_ingest_scaling(args.months, args.rows_per_month, args.categories)
+    print(results.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+
+    # Linear scaling keeps per-file cost flat; quadratic accumulation makes it grow with history.
+    per_file = results["startup_ms_per_file"]
+    print(f"\nper-file startup cost ratio (largest / smallest history): {per_file.iloc[-1] / per_file.iloc[0]:.2f}")
+
+    if args.embedding_backend:
+        embedding_results = bench_embedding(
+            args.embedding_backend, args.embedding_model, args.embedding_docs, args.categories,
+            args.batch_sizes, args.concurrency
+        )
+        print(f"\nembedding throughput ({args.embedding_backend}):")
+        print(embedding_results.to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import pandas as pd
+
+from money import to_dollars
+
+WITHIN_BUDGET = "Within budget"
+OVER_BUDGET = "Over budget"
+NO_TRANSACTIONS = "No transactions"
+NOT_IN_BUDGET = "Not in budget"
+EVALUATION_COLUMNS = ["Budget Name", "Month", "Category", "Budget", "Spent", "Remaining", "Overrun", "Count", "Status"]
+MONEY_COLUMNS = ["Budget", "Spent", "Remaining", "Overrun"]
+
+class BudgetEngine:
+    """Budget vs. actual for every (budget, month, category) in one join over the monthly rollup.
+
+    Money columns stay in integer cents; in_dollars converts a result once for display or export.
+    """
+
+    def __init__(self, rollup):
+        self.rollup = rollup
+
+    @staticmethod
+    def budgets_frame(budgets):
+        return pd.DataFrame(
+            [
+                (budget_name, category, round(float(limit) * 100))
+                for budget_name, budget in budgets.items()
+                for category, limit in budget.items()
+            ],
+            columns = ["Budget Name", "Category", "Budget"]
+        )
+
+    def spent_frame(self, months):
+        totals = self.rollup.totals
+        totals = totals[
+            (totals["Type"] == "Sale")
+            & totals["Month"].isin(months)
+            & (totals["Category"] != "Uncategorized")
+        ]
+        return pd.DataFrame({
+            "Month": totals["Month"],
+            "Category": totals["Category"].astype(str),
+            "Spent": totals["Amount"],
+            "Count": totals["Count"]
+        })
+
+    def evaluate(self, budgets, months):
+        if not budgets or not months:
+            return pd.DataFrame(columns = EVALUATION_COLUMNS)
+
+        planned = self.budgets_frame(budgets).merge(pd.DataFrame({"Month": list(months)}), how = "cross")
+        actual = self.spent_frame(months)
+        # A category is only "not in budget" when none of the evaluated budgets plans for it,
+        # and then it is reported under each of them.
+        in_any_budget = actual["Category"].isin(planned["Category"])
+        unbudgeted = actual[~in_any_budget].merge(pd.DataFrame({"Budget Name": list(budgets)}), how = "cross")
+        evaluation = pd.concat(
+            [planned.merge(actual[in_any_budget], on = ["Month", "Category"], how = "left"), unbudgeted],
+            ignore_index = True
+        )
+
+        # Category mismatches are reported through Status instead of blocking the calculation.
+        not_in_budget = evaluation["Budget"].isna()
+        no_transactions = evaluation["Spent"].isna()
+        evaluation["Budget"] = evaluation["Budget"].fillna(0).astype("int64")
+        evaluation["Spent"] = evaluation["Spent"].fillna(0).astype("int64")
+        evaluation["Count"] = evaluation["Count"].fillna(0).astype(int)
+        evaluation["Remaining"] = evaluation["Budget"] - evaluation["Spent"]
+        evaluation["Overrun"] = (-evaluation["Remaining"]).clip(lower = 0).where(~not_in_budget, 0)
+        evaluation["Status"] = WITHIN_BUDGET
+        evaluation.loc[evaluation["Remaining"] < 0, "Status"] = OVER_BUDGET
+        evaluation.loc[no_transactions, "Status"] = NO_TRANSACTIONS
+        evaluation.loc[not_in_budget, "Status"] = NOT_IN_BUDGET
+
+        return evaluation[EVALUATION_COLUMNS].sort_values(["Budget Name", "Month", "Category"], ignore_index = True)
+
+    @staticmethod
+    def in_dollars(frame):
+        return frame.assign(**{column: to_dollars(frame[column]) for column in MONEY_COLUMNS if column in frame})
+
+    @staticmethod
+    def monthly_trend(evaluation):
+        # Unbudgeted spend has no plan to overrun, so it stays out of the trend.
+        return (
+            evaluation[evaluation["Status"] != NOT_IN_BUDGET]
+            .groupby(["Budget Name", "Month"])[["Budget", "Spent", "Overrun"]]
+            .sum()
+            .reset_index()
+        )
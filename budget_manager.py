@@ -1,21 +1,97 @@
 import json
 import os
+import sqlite3
+import threading
+
+BUDGET_DB_FILENAME = "budgets.sqlite"
+SCHEMA_VERSION = 1
 
 class BudgetManager:
+    """Budgets in one SQLite file, served from an in-memory catalog.
+
+    The catalog is reloaded only when PRAGMA data_version shows another connection
+    (another process, e.g. the CLI) committed since it was read. Budgets saved as
+    JSON files in storage_dir by earlier versions are imported once.
+    """
+
     def __init__(self, storage_dir="budgets"):
         self.storage_dir = storage_dir
         os.makedirs(self.storage_dir, exist_ok=True)
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(os.path.join(self.storage_dir, BUDGET_DB_FILENAME), check_same_thread=False)
+        self.catalog = None
+        self.categories_index = None
+        self.catalog_version = None
+        self._create_schema()
+        self._migrate_json_budgets()
+
+    def _create_schema(self):
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS budgets (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS budget_categories ("
+                "budget_id INTEGER NOT NULL REFERENCES budgets (id), "
+                "position INTEGER NOT NULL, category TEXT NOT NULL, amount TEXT NOT NULL, "
+                "PRIMARY KEY (budget_id, category))"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS budget_categories_category ON budget_categories (category)"
+            )
+
+    def _migrate_json_budgets(self):
+        # The JSON files are left in place; user_version records that they were imported.
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+
+        with self.lock, self.connection:
+            for filename in sorted(os.listdir(self.storage_dir)):
+                if not filename.endswith(".json"):
+                    continue
+                with open(os.path.join(self.storage_dir, filename), "r") as f:
+                    self._write_budget(filename[:-len(".json")], json.load(f))
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _write_budget(self, name, budget):
+        self.connection.execute("INSERT OR IGNORE INTO budgets (name) VALUES (?)", (name,))
+        budget_id = self.connection.execute("SELECT id FROM budgets WHERE name = ?", (name,)).fetchone()[0]
+        self.connection.execute("DELETE FROM budget_categories WHERE budget_id = ?", (budget_id,))
+        self.connection.executemany(
+            "INSERT INTO budget_categories (budget_id, position, category, amount) VALUES (?, ?, ?, ?)",
+            [(budget_id, position, category, str(amount)) for position, (category, amount) in enumerate(budget.items())]
+        )
+
+    def _ensure_catalog(self):
+        data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+        if self.catalog is not None and data_version == self.catalog_version:
+            return
+
+        catalog = {name: {} for (name,) in self.connection.execute("SELECT name FROM budgets ORDER BY id")}
+        categories_index = {}
+        rows = self.connection.execute(
+            "SELECT b.name, c.category, c.amount FROM budget_categories c "
+            "JOIN budgets b ON b.id = c.budget_id ORDER BY b.id, c.position"
+        )
+        for name, category, amount in rows:
+            catalog[name][category] = amount
+            categories_index.setdefault(category, []).append(name)
+
+        self.catalog = catalog
+        self.categories_index = categories_index
+        self.catalog_version = data_version
 
     def save_budget(self, name, budget):
-        filename = os.path.join(self.storage_dir, f"{name}.json")
-        
         problems_with_budget = self.validate_budget(name, budget)
 
         if not problems_with_budget:
-            with open(filename, "w") as f:
-                json.dump(budget, f, indent=2)
+            # One transaction, so a crash mid-save leaves the previous version of the budget intact.
+            with self.lock:
+                with self.connection:
+                    self._write_budget(name, budget)
+                self.catalog = None
         return problems_with_budget
-            
+
     def validate_budget(self, name, budget):
         problems = []
 
@@ -43,20 +119,22 @@ class BudgetManager:
         return problems
 
     def load_budget(self, name):
-        filename = os.path.join(self.storage_dir, f"{name}.json")
-        if os.path.exists(filename):
-            with open(filename, "r") as f:
-                return json.load(f)
-        return None
+        with self.lock:
+            self._ensure_catalog()
+            budget = self.catalog.get(name)
+            return dict(budget) if budget is not None else None
 
     def list_budgets(self):
-        return [f.replace(".json", "") for f in os.listdir(self.storage_dir)]
-    
+        with self.lock:
+            self._ensure_catalog()
+            return list(self.catalog)
+
     def get_all_budgets(self):
-        budget_names = self.list_budgets()
-        
-        budgets_json = {}
-        for name in budget_names:
-            budgets_json[name] = self.load_budget(name)
+        with self.lock:
+            self._ensure_catalog()
+            return {name: dict(budget) for name, budget in self.catalog.items()}
 
-        return budgets_json
\ No newline at end of file
+    def budgets_with_category(self, category):
+        with self.lock:
+            self._ensure_catalog()
+            return list(self.categories_index.get(category, []))
@@ -1,34 +1,60 @@
-import streamlit as st
 import json
 import os
 
+from categorizer import Categorizer
+
 class CategoriesUtils:
-    def __init__(self):
-        if "categories" not in st.session_state:
-            st.session_state.categories = {
-                "Uncategorized": []
-            }
+    def __init__(self, path = "categories.json"):
+        self.path = path
+        self.categories = {
+            "Uncategorized": []
+        }
+        self.version = 0
+        self.categorizer = None
             
-        if os.path.exists("categories.json"):
-            with open("categories.json", "r") as f:
-                st.session_state.categories = json.load(f)
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self.categories = json.load(f)
                 
-    @staticmethod
-    def add_category(category_name):
-        if category_name not in st.session_state.categories.keys():
-            st.session_state.categories[category_name] = []
+    def add_category(self, category_name):
+        if category_name not in self.categories.keys():
+            self.categories[category_name] = []
+            self.version += 1
               
-    @staticmethod
-    def save_categories():
-        with open("categories.json", "w") as f:
-            json.dump(st.session_state.categories, f)
+    def save_categories(self):
+        with open(self.path, "w") as f:
+            json.dump(self.categories, f)
          
-    @staticmethod
-    def add_keyword_to_category(category, keyword):
+    def add_keyword_to_category(self, category, keyword):
         keyword = keyword.strip()
-        if keyword and keyword not in st.session_state.categories[category]:
-            st.session_state.categories[category].append(keyword)
+        if keyword and keyword not in self.categories[category]:
+            self.categories[category].append(keyword)
+            self.version += 1
+    
+    def learn_keywords(self, descriptions, categories):
+        # A description can only map to one category, so drop it from any other list first.
+        learned = {}
+        for description, category in zip(descriptions, categories):
+            keyword = description.strip()
+            if keyword:
+                learned[keyword.lower()] = (keyword, category)
+        if not learned:
+            return
+        
+        for category, keywords in self.categories.items():
+            self.categories[category] = [
+                keyword for keyword in keywords
+                if keyword.lower().strip() not in learned or learned[keyword.lower().strip()][1] == category
+            ]
+        for keyword, category in learned.values():
+            if keyword.lower() not in (existing.lower().strip() for existing in self.categories[category]):
+                self.categories[category].append(keyword)
+        self.version += 1
+    
+    def get_categories(self):
+        return self.categories
     
-    @staticmethod
-    def get_categories():
-        return st.session_state.categories
\ No newline at end of file
+    def get_categorizer(self):
+        if self.categorizer is None or self.categorizer[0] != self.version:
+            self.categorizer = (self.version, Categorizer(self.categories))
+        return self.categorizer[1]
@@ -0,0 +1,120 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+UNCATEGORIZED = "Uncategorized"
+PREFIX_RULE = "prefix:"
+CONTAINS_RULE = "contains:"
+
+def normalize_descriptions(descriptions):
+    if isinstance(descriptions.dtype, pd.CategoricalDtype):
+        # Normalize each distinct description once and broadcast through the codes.
+        normalized = normalize_descriptions(pd.Series(descriptions.cat.categories, dtype = object)).to_numpy()
+        codes = descriptions.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, normalized[codes], "nan"), index = descriptions.index, dtype = object)
+    return descriptions.astype(str).str.lower().str.strip()
+
+class Categorizer:
+    """Keyword rules from categories.json compiled into lookup structures.
+
+    Plain keywords must match the whole normalized description. Keywords written
+    as "prefix:<text>" or "contains:<text>" match the start of, or anywhere in,
+    the description. Exact matches win over prefix rules, which win over
+    substring rules; within a rule type the later category wins, as before.
+    Among substring rules the longest match wins, then the leftmost, whether or
+    not pyahocorasick is installed.
+    """
+
+    def __init__(self, categories):
+        self.exact = {}
+        self.prefixes = {}
+        self.substrings = {}
+
+        for category, keywords in categories.items():
+            if category == UNCATEGORIZED or not keywords:
+                continue
+
+            for keyword in keywords:
+                rule = keyword.lower().strip()
+                if rule.startswith(PREFIX_RULE):
+                    self._add_rule(self.prefixes, rule[len(PREFIX_RULE):], category)
+                elif rule.startswith(CONTAINS_RULE):
+                    self._add_rule(self.substrings, rule[len(CONTAINS_RULE):], category)
+                else:
+                    self._add_rule(self.exact, rule, category)
+
+        self.prefix_pattern = self._compile_alternation(self.prefixes, anchored=True)
+        self.substring_matcher = self._compile_substring_matcher()
+
+    @staticmethod
+    def _add_rule(rules, pattern, category):
+        pattern = pattern.strip()
+        if pattern:
+            rules[pattern] = category
+
+    @staticmethod
+    def _compile_alternation(rules, anchored=False):
+        if not rules:
+            return None
+        # Longest first so the regex alternation prefers the most specific rule. Unanchored, the
+        # lookahead reports the longest rule starting at every position, not only the leftmost match.
+        alternatives = "|".join(re.escape(p) for p in sorted(rules, key=len, reverse=True))
+        return re.compile(f"^(?:{alternatives})" if anchored else f"(?=({alternatives}))")
+
+    def _compile_substring_matcher(self):
+        if not self.substrings:
+            return None
+        if ahocorasick is None:
+            return self._compile_alternation(self.substrings)
+
+        automaton = ahocorasick.Automaton()
+        for pattern in self.substrings:
+            automaton.add_word(pattern, pattern)
+        automaton.make_automaton()
+        return automaton
+
+    def _match_prefix(self, description):
+        match = self.prefix_pattern.match(description)
+        return self.prefixes[match.group(0)] if match else None
+
+    def _match_substring(self, description):
+        # Both matchers yield candidates left to right, so keeping the first of the longest is longest-then-leftmost.
+        if ahocorasick is None:
+            candidates = (match.group(1) for match in self.substring_matcher.finditer(description))
+        else:
+            candidates = (pattern for _, pattern in self.substring_matcher.iter(description))
+
+        best = None
+        for pattern in candidates:
+            if best is None or len(pattern) > len(best):
+                best = pattern
+        return self.substrings[best] if best else None
+
+    def categorize(self, descriptions):
+        normalized = normalize_descriptions(descriptions)
+        categories = normalized.map(self.exact)
+
+        if self.prefix_pattern is not None or self.substring_matcher is not None:
+            unmatched = categories.isna()
+            # Pattern rules only need to run once per distinct description.
+            unique_descriptions = pd.unique(normalized[unmatched])
+            pattern_matches = {}
+            for description in unique_descriptions:
+                category = None
+                if self.prefix_pattern is not None:
+                    category = self._match_prefix(description)
+                if category is None and self.substring_matcher is not None:
+                    category = self._match_substring(description)
+                if category is not None:
+                    pattern_matches[description] = category
+
+            if pattern_matches:
+                categories = categories.where(~unmatched, normalized.map(pattern_matches))
+
+        return categories.fillna(UNCATEGORIZED).astype(object)
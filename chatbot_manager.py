@@ -1,28 +1,89 @@
+import time
+
 from ollama import chat
 
+from conversation_context import ConversationContext, DEFAULT_SUMMARY_TOKENS
+from instrumentation import metrics
+
 class ChatbotManager:
-    def __init__(self, retriever, model_name = "llama3"):
+    def __init__(self, retriever, model_name = "llama3", query_router = None, chat_fn = chat):
         self.retriever = retriever
         self.model_name = model_name
+        self.query_router = query_router
+        self.chat_fn = chat_fn
+        self.conversation_context = ConversationContext(self.summarize)
+    
+    def ask(self, conversation, timings = None):
+        return "".join(self.ask_stream(conversation, timings))
     
-    def ask(self, conversation):
+    def ask_stream(self, conversation, timings = None):
+        # Timings go into a caller-owned dict because this manager is shared between sessions.
+        timings = {} if timings is None else timings
+        start = time.perf_counter()
+        
         latest_user_msg = [m["content"] for m in conversation if m["role"] == "user"][-1]
-        docs = self.retriever.get_relevant_documents(latest_user_msg)
-        context = "\n".join([doc.page_content for doc in docs])
+        routed = self.query_router.route(latest_user_msg) if self.query_router else None
+        if routed is not None and routed.direct:
+            timings["routing"] = timings["total"] = time.perf_counter() - start
+            self.record_timings(timings)
+            yield routed.text
+            return
+        
+        # Questions the router can compute skip vector search and hand the model exact figures.
+        if routed is not None:
+            documents = [routed.text]
+        else:
+            documents = [doc.page_content for doc in self.retriever.get_relevant_documents(latest_user_msg)]
+        retrieved = time.perf_counter()
+        timings["retrieval"] = retrieved - start
+        
+        prompt = self.build_prompt(*self.conversation_context.build(conversation, documents))
+        prompt_built = time.perf_counter()
+        timings["prompt_build"] = prompt_built - retrieved
 
-        history_text = "\n".join([f"{m['role']}: {m['content']}" for m in conversation])
-        prompt = (
+        stream = self.chat_fn(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True
+        )
+        for chunk in stream:
+            token = chunk["message"]["content"]
+            if "time_to_first_token" not in timings:
+                timings["time_to_first_token"] = time.perf_counter() - prompt_built
+            yield token
+
+        finished = time.perf_counter()
+        timings["generation"] = finished - prompt_built
+        timings["total"] = finished - start
+        self.record_timings(timings)
+        
+    @staticmethod
+    def record_timings(timings):
+        for key, seconds in timings.items():
+            metrics.record(f"chat.{key}", seconds)
+        
+    def build_prompt(self, summary, history_text, context):
+        summary_text = f"Summary of earlier conversation:\n{summary}\n\n" if summary else ""
+        return (
             "You are a helpful personal finance assistant.\n"
             "Use the following data to answer the question accurately. "
             "Do not make up information.\n\n"
             f"Data:\n{context}\n\n"
+            f"{summary_text}"
             f"Conversation history:\n{history_text}\n"
             f"Answer the last question clearly:\n"
         )
-
-        response = chat(
+    
+    def summarize(self, previous_summary, messages_text):
+        response = self.chat_fn(
             model=self.model_name,
-            messages=[{"role": "user", "content": prompt}]
+            messages=[{"role": "user", "content": (
+                "Update the running summary of a personal finance conversation. "
+                "Keep every figure, category, month and decision the user may refer back to. "
+                f"Use at most {DEFAULT_SUMMARY_TOKENS * 3 // 4} words.\n\n"
+                f"Current summary:\n{previous_summary or '(none)'}\n\n"
+                f"New messages:\n{messages_text}\n\n"
+                "Updated summary:"
+            )}]
         )
-
-        return response["message"]["content"]
\ No newline at end of file
+        return response["message"]["content"].strip()
@@ -0,0 +1,148 @@
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+
+from constants import (
+    TRANSACTION_STORE_PATH, PREVIOUS_TRANSACTIONS_PATH, INGEST_MAX_WORKERS, EMBEDDING_BACKEND,
+    EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_CONCURRENCY
+)
+from categories_utils import CategoriesUtils
+from budget_manager import BudgetManager
+from budget_engine import BudgetEngine, EVALUATION_COLUMNS
+from transaction_manager import TransactionManager
+from transaction_store import TransactionStore
+from instrumentation import metrics
+
+def load_managers(args):
+    categories_utils = CategoriesUtils(args.categories)
+    transaction_manager = TransactionManager(
+        categories_utils.get_categorizer(), TransactionStore(args.store), args.history_dir
+    )
+    return categories_utils, transaction_manager
+
+def ingest(args):
+    files = sorted(glob.glob(os.path.join(args.directory, "*.csv")))
+    if not files:
+        print(f"No CSV files found in {args.directory}", file=sys.stderr)
+        return 1
+
+    categories_utils, transaction_manager = load_managers(args)
+    start = time.perf_counter()
+    report = transaction_manager.add_transactions_batch(files, categories_utils.get_categorizer(), args.workers)
+    transaction_manager.save_transactions()
+    print(f"Ingested {len(files)} files in {time.perf_counter() - start:.1f}s: {report}")
+    return 0
+
+def recategorize(args):
+    categories_utils, transaction_manager = load_managers(args)
+    changed = transaction_manager.recategorize_expenses(categories_utils.get_categorizer())
+    transaction_manager.save_transactions()
+    print(f"Recategorized {changed:,} expenses against {args.categories}")
+    return 0
+
+def index(args):
+    # Imported here so the other commands do not load the vector stack.
+    from data_manager import DataManager
+
+    _, transaction_manager = load_managers(args)
+    data_manager = DataManager(
+        transaction_manager.transactions,
+        BudgetManager(args.budgets_dir).get_all_budgets(),
+        embedding_model=args.model,
+        embedding_backend=args.backend,
+        batch_size=args.batch_size,
+        max_concurrency=args.concurrency,
+        rebuild=args.rebuild
+    )
+    added, removed = data_manager.last_sync
+    print(f"Index {'rebuilt' if args.rebuild else 'updated'}: {added:,} added, {removed:,} removed, {len(data_manager.documents):,} total")
+    print(f"Embedding: {data_manager.last_embedding}")
+    return 0
+
+def report(args):
+    _, transaction_manager = load_managers(args)
+    budget_manager = BudgetManager(args.budgets_dir)
+    budgets = budget_manager.get_all_budgets()
+    if args.budgets:
+        budgets = {name: budget for name, budget in budgets.items() if name in args.budgets}
+    months = args.months or transaction_manager.get_available_months()
+    if not budgets or not months:
+        print("No budgets or months to report on", file=sys.stderr)
+        return 1
+
+    evaluation = BudgetEngine(transaction_manager.rollup).evaluate(budgets, months)
+    os.makedirs(args.out, exist_ok=True)
+    for month, monthly in evaluation.groupby("Month"):
+        BudgetEngine.in_dollars(monthly[EVALUATION_COLUMNS]).to_csv(os.path.join(args.out, f"{month}_budget_report.csv"), index=False)
+    print(f"Wrote {evaluation['Month'].nunique()} monthly budget reports to {args.out}")
+    return 0
+
+def export(args):
+    # Reads only the requested month partitions, with the Type filter pushed down to pyarrow.
+    filters = [("Type", "==", args.type)] if args.type else None
+    store = TransactionStore(args.store)
+    with store.lock():
+        transactions = store.load(months=args.months, filters=filters)
+    if transactions.empty:
+        print("No transactions to export", file=sys.stderr)
+        return 1
+
+    files = TransactionManager.export_transactions(transactions, args.out)
+    print(f"Exported {len(transactions):,} transactions to {files} monthly CSV files in {args.out}")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Finance tracker batch jobs")
+    parser.add_argument("--store", default=TRANSACTION_STORE_PATH)
+    parser.add_argument("--history-dir", default=PREVIOUS_TRANSACTIONS_PATH)
+    parser.add_argument("--categories", default="categories.json")
+    parser.add_argument("--budgets-dir", default="budgets")
+    parser.add_argument("--metrics-json", help="write timers, counters and peak memory to this file")
+    parser.add_argument("--log-metrics", action="store_true", help="log the metrics snapshot as one JSON line")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="import every CSV statement in a directory")
+    ingest_parser.add_argument("directory")
+    ingest_parser.add_argument("--workers", type=int, default=INGEST_MAX_WORKERS)
+    ingest_parser.set_defaults(run=ingest)
+
+    recategorize_parser = commands.add_parser("recategorize", help="re-apply categories.json to all expenses")
+    recategorize_parser.set_defaults(run=recategorize)
+
+    index_parser = commands.add_parser("index", help="update the vector index, or rebuild it")
+    index_parser.add_argument("--rebuild", action="store_true")
+    index_parser.add_argument("--backend", default=EMBEDDING_BACKEND)
+    index_parser.add_argument("--model")
+    index_parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE)
+    index_parser.add_argument("--concurrency", type=int, default=EMBEDDING_MAX_CONCURRENCY)
+    index_parser.set_defaults(run=index)
+
+    report_parser = commands.add_parser("report", help="export budget vs. actual per month as CSV")
+    report_parser.add_argument("--out", required=True)
+    report_parser.add_argument("--months", nargs="+", help="YYYY-MM, defaults to every month")
+    report_parser.add_argument("--budgets", nargs="+", help="defaults to every saved budget")
+    report_parser.set_defaults(run=report)
+
+    export_parser = commands.add_parser("export", help="write the stored transactions as monthly statement CSVs")
+    export_parser.add_argument("--out", required=True)
+    export_parser.add_argument("--months", nargs="+", help="YYYY-MM, defaults to every month")
+    export_parser.add_argument("--type", choices=["Sale", "Payment"], help="defaults to both")
+    export_parser.set_defaults(run=export)
+    return parser
+
+def main():
+    args = build_parser().parse_args()
+    status = args.run(args)
+    if args.metrics_json:
+        with open(args.metrics_json, "w") as f:
+            f.write(metrics.to_json())
+    if args.log_metrics:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+        metrics.log_snapshot()
+    sys.exit(status)
+
+if __name__ == "__main__":
+    main()
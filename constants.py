@@ -1,4 +1,18 @@
 import os
 
 TRANSACTION_DF_COLUMNS = ["Transaction Date", "Description", "Amount", "Category"]
-PREVIOUS_TRANSACTIONS_PATH = f"{os.getcwd()}/previous_transactions"
\ No newline at end of file
+PREVIOUS_TRANSACTIONS_PATH = f"{os.getcwd()}/previous_transactions"
+TRANSACTION_STORE_PATH = f"{os.getcwd()}/transaction_store"
+INGEST_MAX_WORKERS = min(4, os.cpu_count() or 1)
+PARALLEL_INGEST_MIN_FILES = 8
+INGEST_CHUNK_ROWS = 50_000
+CSV_DTYPES = {"Transaction Date": str, "Description": str, "Amount": "float64", "Type": str}
+CHROMA_DB_PATH = "./chroma_db"
+EMBEDDING_BACKEND = "ollama"
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_MAX_CONCURRENCY = 4
+EMBEDDING_CACHE_PATH = f"{os.getcwd()}/embedding_cache.sqlite"
+EMBEDDING_CACHE_MAX_BYTES = 256 * 1024 * 1024
+JOB_MAX_THREADS = 2
+JOB_MAX_PROCESSES = INGEST_MAX_WORKERS
+JOB_RETENTION_S = 600
@@ -0,0 +1,104 @@
+import hashlib
+from collections import OrderedDict
+
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 2000
+DEFAULT_RECENT_MESSAGES = 6
+DEFAULT_SUMMARY_TOKENS = 200
+MAX_CACHED_SUMMARIES = 256
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def truncate_to_tokens(text, tokens):
+    max_chars = tokens * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "…"
+
+def format_messages(messages):
+    return "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+
+class ConversationContext:
+    """Fits conversation history and retrieved data into a fixed prompt token budget.
+
+    The most recent messages are kept verbatim; everything older is folded into
+    a running summary produced by `summarize(previous_summary, messages)`. The
+    summary is cached per conversation prefix, so each new turn only summarizes
+    the messages that just fell out of the window.
+    """
+
+    def __init__(self, summarize, token_budget = DEFAULT_TOKEN_BUDGET,
+                 recent_messages = DEFAULT_RECENT_MESSAGES, summary_tokens = DEFAULT_SUMMARY_TOKENS):
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.recent_messages = recent_messages
+        self.summary_tokens = summary_tokens
+        self.summaries = OrderedDict()
+
+    def build(self, conversation, documents):
+        history_budget = self.token_budget // 2
+        split = max(0, len(conversation) - self.recent_messages)
+        while split < len(conversation) - 1 and estimate_tokens(format_messages(conversation[split:])) > history_budget:
+            split += 1
+
+        recent = [dict(m) for m in conversation[split:]]
+        if recent and estimate_tokens(format_messages(recent)) > history_budget:
+            recent[-1]["content"] = truncate_to_tokens(recent[-1]["content"], history_budget)
+
+        summary = self.summary_for(conversation[:split])
+        history = format_messages(recent)
+        data_budget = self.token_budget - estimate_tokens(history) - estimate_tokens(summary)
+
+        return summary, history, self.select_documents(documents, summary + history, data_budget)
+
+    def summary_for(self, messages):
+        if not messages:
+            return ""
+
+        prefix_keys = self.prefix_keys(messages)
+        summary, summarized = "", 0
+        for count in range(len(messages), 0, -1):
+            if prefix_keys[count - 1] in self.summaries:
+                summary, summarized = self.summaries[prefix_keys[count - 1]], count
+                self.summaries.move_to_end(prefix_keys[count - 1])
+                break
+
+        if summarized < len(messages):
+            summary = truncate_to_tokens(
+                self.summarize(summary, format_messages(messages[summarized:])),
+                self.summary_tokens
+            )
+            self.summaries[prefix_keys[-1]] = summary
+            while len(self.summaries) > MAX_CACHED_SUMMARIES:
+                self.summaries.popitem(last = False)
+
+        return summary
+
+    @staticmethod
+    def prefix_keys(messages):
+        # Chained hashes identify each conversation prefix without storing the text.
+        keys = []
+        digest = hashlib.sha256()
+        for m in messages:
+            digest.update(f"{m['role']}\x00{m['content']}\x00".encode("utf-8"))
+            keys.append(digest.copy().hexdigest())
+        return keys
+
+    @staticmethod
+    def select_documents(documents, present_text, data_budget):
+        selected = []
+        seen = set()
+        used_tokens = 0
+        for document in documents:
+            if document in seen or document in present_text:
+                continue
+            seen.add(document)
+
+            tokens = estimate_tokens(document)
+            if used_tokens + tokens > data_budget:
+                if not selected:
+                    selected.append(truncate_to_tokens(document, max(data_budget, 0)))
+                break
+            selected.append(document)
+            used_tokens += tokens
+
+        return "\n".join(selected)
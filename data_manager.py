@@ -1,53 +1,161 @@
+import hashlib
+import json
+import re
+
+import pandas as pd
 from langchain.schema import Document
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import OllamaEmbeddings
+
+from constants import CHROMA_DB_PATH, EMBEDDING_BACKEND, EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_CONCURRENCY
+from embedding_pipeline import EmbeddingPipeline, EmbeddingStats, create_backend, DEFAULT_EMBEDDING_MODELS
+from embedding_cache import EmbeddingCache
+from retrieval import HybridRetriever
+from instrumentation import metrics, instrumented
+
+# Chroma rejects writes above its max batch size (5461 by default).
+VECTOR_DB_WRITE_BATCH = 5000
 
 class DataManager:
-    def __init__(self, transactions_df, budgets, embedding_model="all-minilm"):
+    def __init__(
+        self,
+        transactions_df,
+        budgets,
+        embedding_model=None,
+        embedding_backend=EMBEDDING_BACKEND,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        max_concurrency=EMBEDDING_MAX_CONCURRENCY,
+        embedding_cache=None,
+        rebuild=False
+    ):
         self.transactions_df = transactions_df
         self.budgets = budgets
-        self.embedding_model = embedding_model
-        self.embeddings = OllamaEmbeddings(model = self.embedding_model)
+        self.embedding_backend = embedding_backend
+        self.embedding_model = embedding_model or DEFAULT_EMBEDDING_MODELS[embedding_backend]
+        self.embeddings = EmbeddingPipeline(
+            create_backend(self.embedding_backend, self.embedding_model),
+            batch_size=batch_size,
+            max_concurrency=max_concurrency,
+            cache=embedding_cache or EmbeddingCache(),
+            model_key=f"{self.embedding_backend}:{self.embedding_model}"
+        )
         self.vector_db = None
-        self._prepare_vector_db()
-        
-    def _prepare_vector_db(self):
+        self.documents = []
+        self.version = 0
+        self.last_sync = (0, 0)
+        self.last_embedding = EmbeddingStats()
+        self._prepare_vector_db(rebuild)
+
+    def _prepare_vector_db(self, rebuild=False):
+        # Vectors from different models are not comparable, so each model gets its own collection.
+        self.vector_db = Chroma(
+            collection_name=self.collection_name(self.embedding_backend, self.embedding_model),
+            embedding_function=self.embeddings,
+            persist_directory=CHROMA_DB_PATH
+        )
+        if rebuild:
+            # Every stored vector is dropped; unchanged texts still come back from the embedding cache.
+            existing_ids = self.vector_db.get(include=[])["ids"]
+            for start in range(0, len(existing_ids), VECTOR_DB_WRITE_BATCH):
+                self.vector_db.delete(ids=existing_ids[start:start + VECTOR_DB_WRITE_BATCH])
+        self._sync_vector_db(self._build_documents())
+
+    @staticmethod
+    def collection_name(backend, model):
+        return re.sub(r"[^a-zA-Z0-9_-]+", "-", f"finance-{backend}-{model}")[:63].strip("-_")
+
+    def refresh(self, transactions_df, budgets):
+        self.transactions_df = transactions_df
+        self.budgets = budgets
+        return self._sync_vector_db(self._build_documents())
+
+    @instrumented("index.build_documents")
+    def _build_documents(self):
         docs = []
-        
-        if self.transactions_df is not None:
-            for _, row in self.transactions_df.iterrows():
-                docs.append(
-                    Document (
-                        page_content= (
-                            f"Transaction:\n"
-                            f"- Date: {row['Transaction Date']}\n"
-                            f"- Category: {row['Category']}\n"
-                            f"- Amount: {row['Amount']}\n"
-                            f"- Type: {row['Type']}\n"
-                            f"- Description: {row['Description']}\n"
-                        )
-                    ) 
-                )
-        
+        if self.transactions_df is not None and not self.transactions_df.empty:
+            docs.extend(self.transaction_documents(self.transactions_df))
         if self.budgets:
-            for budget_name, budget in self.budgets.items():
-                for category, limit in budget.items():
-                    docs.append(
-                        Document(
-                            page_content=(
-                                f"Budget:\n"
-                                f"- Budget Name: {budget_name}\n"
-                                f"- Category: {category}\n"
-                                f"- Monthly Limit: {limit}\n"
-                            )
-                        )
-                    )
-                
-        self.vector_db = Chroma.from_documents(
-            docs,
-            self.embeddings,
-            persist_directory="./chroma_db"
+            docs.extend(self.budget_documents(self.budgets))
+        return docs
+
+    @staticmethod
+    def transaction_documents(transactions_df):
+        # Rendered column-wise into one compact line per row; dates are formatted once per distinct day.
+        date_codes, unique_dates = pd.factorize(transactions_df["Transaction Date"])
+        dates = pd.Series(unique_dates.strftime("%Y-%m-%d")[date_codes], index=transactions_df.index)
+        cents = transactions_df["Amount"].astype("int64")
+        amounts = (cents // 100).astype(str) + "." + (cents % 100).astype(str).str.zfill(2)
+        categories = transactions_df["Category"].astype(str)
+        types = transactions_df["Type"].astype(str)
+        descriptions = transactions_df["Description"].astype(str)
+
+        contents = (
+            "Transaction " + dates + " | " + categories + " | $" + amounts
+            + " | " + types + " | " + descriptions
         )
-        
+        metadata = pd.DataFrame({
+            "kind": "transaction",
+            "date": dates,
+            "month": dates.str[:7],
+            "category": categories,
+            "amount": cents / 100,
+            "type": types,
+            "description": descriptions
+        }).to_dict("records")
+        return [Document(page_content=content, metadata=meta) for content, meta in zip(contents, metadata)]
+
+    @staticmethod
+    def budget_documents(budgets):
+        return [
+            Document(
+                page_content=f"Budget {budget_name} | {category} | monthly limit ${float(limit):.2f}",
+                metadata={
+                    "kind": "budget",
+                    "budget_name": budget_name,
+                    "category": category,
+                    "amount": float(limit)
+                }
+            )
+            for budget_name, budget in budgets.items()
+            for category, limit in budget.items()
+        ]
+
+    @instrumented("index.sync")
+    def _sync_vector_db(self, docs):
+        docs_by_id = self.index_documents(docs)
+        existing_ids = set(self.vector_db.get(include=[])["ids"])
+
+        stale_ids = list(existing_ids - docs_by_id.keys())
+        new_ids = [doc_id for doc_id in docs_by_id if doc_id not in existing_ids]
+
+        for start in range(0, len(stale_ids), VECTOR_DB_WRITE_BATCH):
+            self.vector_db.delete(ids=stale_ids[start:start + VECTOR_DB_WRITE_BATCH])
+        self.last_embedding = EmbeddingStats()
+        for start in range(0, len(new_ids), VECTOR_DB_WRITE_BATCH):
+            batch_ids = new_ids[start:start + VECTOR_DB_WRITE_BATCH]
+            self.vector_db.add_documents([docs_by_id[doc_id] for doc_id in batch_ids], ids=batch_ids)
+            self.last_embedding.add(self.embeddings.last_run)
+
+        self.documents = list(docs_by_id.values())
+        self.version += 1
+        self.last_sync = (len(new_ids), len(stale_ids))
+        metrics.count("docs.indexed", len(new_ids))
+        metrics.count("docs.removed", len(stale_ids))
+        return self.last_sync
+
+    @staticmethod
+    def index_documents(docs):
+        # Identical rows (e.g. two equal purchases on the same day) share a content
+        # hash, so the occurrence number keeps their ids distinct and stable.
+        docs_by_id = {}
+        occurrences = {}
+        for doc in docs:
+            content = doc.page_content + json.dumps(doc.metadata, sort_keys=True)
+            content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            occurrence = occurrences.get(content_hash, 0)
+            occurrences[content_hash] = occurrence + 1
+            docs_by_id[f"{content_hash}-{occurrence}"] = doc
+
+        return docs_by_id
+
     def get_retriever(self):
-        return self.vector_db.as_retriever(search_kwargs={"k": 4})
\ No newline at end of file
+        return HybridRetriever(self, k=4)
@@ -0,0 +1,114 @@
+import os
+
+import pandas as pd
+
+from categorizer import normalize_descriptions
+from money import to_cents
+
+FINGERPRINTS_FILENAME = "fingerprints.parquet"
+CONFLICT_KEYS_FILENAME = "conflict_keys.parquet"
+
+def hash_rows(columns):
+    return pd.util.hash_pandas_object(pd.DataFrame(columns), index=False).to_numpy()
+
+def fingerprint_transactions(df):
+    date_ns = pd.to_datetime(df["Transaction Date"]).astype("int64").to_numpy()
+    description = normalize_descriptions(df["Description"]).to_numpy()
+    transaction_type = df["Type"].astype(str).to_numpy()
+    cents = to_cents(df["Amount"]).to_numpy()
+
+    fingerprints = hash_rows({"date": date_ns, "amount": cents, "description": description, "type": transaction_type})
+    # Same day, merchant and type with a different amount: kept, but reported as a possible conflict.
+    conflict_keys = hash_rows({"date": date_ns, "description": description, "type": transaction_type})
+    return fingerprints, conflict_keys
+
+def merge_counts(existing, counts):
+    if existing.empty:
+        return counts
+    return pd.concat([existing, counts]).groupby(level=0).max()
+
+class IngestReport:
+    def __init__(self):
+        self.new = 0
+        self.duplicate = 0
+        self.conflicting = 0
+        # Statement rows without an amount, dropped before deduplication.
+        self.skipped = 0
+
+    def add(self, other):
+        self.new += other.new
+        self.duplicate += other.duplicate
+        self.conflicting += other.conflicting
+        self.skipped += other.skipped
+
+    def __str__(self):
+        summary = f"{self.new:,} new, {self.duplicate:,} duplicate, {self.conflicting:,} conflicting"
+        return summary + (f", {self.skipped:,} skipped without an amount" if self.skipped else "")
+
+class FingerprintIndex:
+    """Occurrence counts per transaction fingerprint, so a row that appears twice in one
+    statement is kept twice while the same statement uploaded again adds nothing."""
+
+    def __init__(self, root):
+        self.fingerprints_path = os.path.join(root, FINGERPRINTS_FILENAME)
+        self.conflict_keys_path = os.path.join(root, CONFLICT_KEYS_FILENAME)
+        self.counts = pd.Series(dtype="int64")
+        self.conflict_counts = pd.Series(dtype="int64")
+
+    def rebuild(self, transactions_df):
+        self.counts = pd.Series(dtype="int64")
+        self.conflict_counts = pd.Series(dtype="int64")
+        if not transactions_df.empty:
+            session = self.start_session()
+            session.filter(transactions_df)
+            session.commit()
+
+    def start_session(self):
+        return DedupSession(self)
+
+    def load(self):
+        if not (os.path.exists(self.fingerprints_path) and os.path.exists(self.conflict_keys_path)):
+            return False
+        self.counts = pd.read_parquet(self.fingerprints_path).set_index("Key")["Count"]
+        self.conflict_counts = pd.read_parquet(self.conflict_keys_path).set_index("Key")["Count"]
+        return True
+
+    def save(self):
+        for counts, path in ((self.counts, self.fingerprints_path), (self.conflict_counts, self.conflict_keys_path)):
+            tmp_path = path + ".tmp"
+            counts.rename_axis("Key").rename("Count").reset_index().to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+
+class DedupSession:
+    """Deduplicates one source file, possibly fed in several chunks, against the index as it was."""
+
+    def __init__(self, index):
+        self.index = index
+        self.seen = pd.Series(dtype="int64")
+        self.seen_conflict_keys = pd.Series(dtype="int64")
+        self.report = IngestReport()
+
+    def filter(self, df):
+        if df.empty:
+            return df
+
+        fingerprints, conflict_keys = fingerprint_transactions(df)
+        fingerprints = pd.Series(fingerprints)
+        conflict_keys = pd.Series(conflict_keys)
+
+        occurrence = fingerprints.map(self.seen).fillna(0).astype("int64") + fingerprints.groupby(fingerprints).cumcount()
+        stored = fingerprints.map(self.index.counts).fillna(0).astype("int64")
+        is_new = (occurrence >= stored).to_numpy()
+        is_conflict = is_new & (stored == 0).to_numpy() & conflict_keys.isin(self.index.conflict_counts.index).to_numpy()
+
+        self.seen = self.seen.add(fingerprints.value_counts(), fill_value=0).astype("int64")
+        self.seen_conflict_keys = self.seen_conflict_keys.add(conflict_keys.value_counts(), fill_value=0).astype("int64")
+        self.report.new += int(is_new.sum())
+        self.report.duplicate += int((~is_new).sum())
+        self.report.conflicting += int(is_conflict.sum())
+        return df[is_new]
+
+    def commit(self):
+        self.index.counts = merge_counts(self.index.counts, self.seen)
+        self.index.conflict_counts = merge_counts(self.index.conflict_counts, self.seen_conflict_keys)
+        return self.report
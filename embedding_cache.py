@@ -0,0 +1,97 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from constants import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_BYTES
+
+SQLITE_MAX_VARIABLES = 900
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Vectors keyed by (model, text hash) in SQLite, evicting the least recently used once over max_bytes."""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_bytes=EMBEDDING_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (model, text_hash))"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model, texts):
+        hashes_by_text = {text: text_hash(text) for text in texts}
+        hashes = list(set(hashes_by_text.values()))
+        found = {}
+        with self.lock:
+            for start in range(0, len(hashes), SQLITE_MAX_VARIABLES):
+                chunk = hashes[start:start + SQLITE_MAX_VARIABLES]
+                rows = self.connection.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? "
+                    f"AND text_hash IN ({', '.join('?' * len(chunk))})",
+                    [model, *chunk]
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=np.float32).tolist()) for key, vector in rows)
+
+            if found:
+                now = time.time()
+                with self.connection:
+                    self.connection.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                        [(now, model, key) for key in found]
+                    )
+        return {text: found[key] for text, key in hashes_by_text.items() if key in found}
+
+    def put_many(self, model, texts, vectors):
+        now = time.time()
+        rows = {}
+        for text, vector in zip(texts, vectors):
+            key = text_hash(text)
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows[key] = (model, key, blob, len(blob), now)
+
+        with self.lock:
+            with self.connection:
+                replaced = self._stored_bytes(model, list(rows))
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                    rows.values()
+                )
+                self.total_bytes += sum(row[3] for row in rows.values()) - replaced
+                self._evict()
+
+    def _stored_bytes(self, model, hashes):
+        stored = 0
+        for start in range(0, len(hashes), SQLITE_MAX_VARIABLES):
+            chunk = hashes[start:start + SQLITE_MAX_VARIABLES]
+            stored += self.connection.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM embeddings WHERE model = ? "
+                f"AND text_hash IN ({', '.join('?' * len(chunk))})",
+                [model, *chunk]
+            ).fetchone()[0]
+        return stored
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+
+        excess = self.total_bytes - self.max_bytes
+        cursor = self.connection.execute("SELECT model, text_hash, size FROM embeddings ORDER BY last_used")
+        evicted = []
+        for model, key, size in cursor:
+            evicted.append((model, key))
+            excess -= size
+            self.total_bytes -= size
+            if excess <= 0:
+                break
+        cursor.close()
+        self.connection.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", evicted)
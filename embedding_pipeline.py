@@ -0,0 +1,114 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+from constants import EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_CONCURRENCY
+from instrumentation import metrics, instrumented
+
+OLLAMA_BACKEND = "ollama"
+SENTENCE_TRANSFORMERS_BACKEND = "sentence-transformers"
+DEFAULT_EMBEDDING_MODELS = {
+    OLLAMA_BACKEND: "all-minilm",
+    SENTENCE_TRANSFORMERS_BACKEND: "all-MiniLM-L6-v2",
+}
+
+class OllamaBackend:
+    def __init__(self, model):
+        from langchain_community.embeddings import OllamaEmbeddings
+
+        self.embeddings = OllamaEmbeddings(model=model)
+
+    def embed(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+class SentenceTransformerBackend:
+    """Runs the model in-process, so indexing works without an Ollama server."""
+
+    def __init__(self, model):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model)
+
+    def embed(self, texts):
+        return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True).tolist()
+
+EMBEDDING_BACKENDS = {
+    OLLAMA_BACKEND: OllamaBackend,
+    SENTENCE_TRANSFORMERS_BACKEND: SentenceTransformerBackend,
+}
+
+def create_backend(backend, model=None):
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {sorted(EMBEDDING_BACKENDS)}")
+    return EMBEDDING_BACKENDS[backend](model or DEFAULT_EMBEDDING_MODELS[backend])
+
+class EmbeddingStats:
+    def __init__(self, docs=0, seconds=0.0, reused=0):
+        self.docs = docs
+        self.seconds = seconds
+        self.reused = reused
+
+    def add(self, other):
+        self.docs += other.docs
+        self.seconds += other.seconds
+        self.reused += other.reused
+
+    @property
+    def docs_per_second(self):
+        return self.docs / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return f"{self.docs:,} docs in {self.seconds:.2f}s ({self.docs_per_second:,.1f} docs/s, {self.reused:,} reused)"
+
+class EmbeddingPipeline(Embeddings):
+    """Splits texts into fixed-size batches and embeds up to max_concurrency batches at once.
+
+    With a cache, only texts the model has not embedded before (keyed by model_key)
+    are sent to the backend, for documents and queries alike.
+    """
+
+    def __init__(
+        self,
+        backend,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        max_concurrency=EMBEDDING_MAX_CONCURRENCY,
+        cache=None,
+        model_key=None
+    ):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.model_key = model_key
+        self.last_run = EmbeddingStats()
+
+    def embed_documents(self, texts):
+        start = time.perf_counter()
+        vectors, embedded_count = self._embed_cached(texts)
+        self.last_run = EmbeddingStats(len(texts), time.perf_counter() - start, len(texts) - embedded_count)
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed_cached([text])[0][0]
+
+    @instrumented("embedding.embed")
+    def _embed_cached(self, texts):
+        cached = self.cache.get_many(self.model_key, texts) if self.cache is not None else {}
+        missing = list(dict.fromkeys(text for text in texts if text not in cached))
+
+        embedded = dict(zip(missing, self._embed_batches(missing)))
+        metrics.count("docs.embedded", len(missing))
+        metrics.count("docs.embedding_reused", len(texts) - len(missing))
+        if self.cache is not None and embedded:
+            self.cache.put_many(self.model_key, list(embedded), list(embedded.values()))
+        return [cached[text] if text in cached else embedded[text] for text in texts], len(missing)
+
+    def _embed_batches(self, texts):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1 or self.max_concurrency <= 1:
+            results = [self.backend.embed(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                results = list(executor.map(self.backend.embed, batches))
+        return [vector for batch in results for vector in batch]
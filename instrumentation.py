@@ -0,0 +1,130 @@
+import cProfile
+import functools
+import io
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PROFILE_TOP_N = 30
+
+logger = logging.getLogger("finance_tracker.metrics")
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux but bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class TimerStats:
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.peak_rss = None
+
+    def record(self, seconds, peak_rss):
+        self.calls += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+        self.peak_rss = peak_rss
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "total_s": self.total,
+            "mean_s": self.total / self.calls if self.calls else 0.0,
+            "max_s": self.max,
+            "last_s": self.last,
+            "peak_rss_bytes": self.peak_rss,
+        }
+
+class Metrics:
+    """Process-wide timers and counters for the hot paths, cheap enough to leave on."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timers = {}
+        self.counters = {}
+        self.started_at = time.time()
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        peak_rss = peak_rss_bytes()
+        with self.lock:
+            self.timers.setdefault(name, TimerStats()).record(seconds, peak_rss)
+
+    def count(self, name, amount = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "started_at": self.started_at,
+                "captured_at": time.time(),
+                "peak_rss_bytes": peak_rss_bytes(),
+                "timers": {name: stats.as_dict() for name, stats in sorted(self.timers.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent = 2)
+
+    def log_snapshot(self):
+        logger.info(json.dumps(self.snapshot()))
+
+    def reset(self):
+        with self.lock:
+            self.timers.clear()
+            self.counters.clear()
+            self.started_at = time.time()
+
+metrics = Metrics()
+
+def instrumented(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with metrics.timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def timed_iter(iterable, name):
+    # Times how long each item takes to produce, e.g. parsing the next CSV chunk.
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        metrics.record(name, time.perf_counter() - start)
+        yield item
+
+def profile_call(fn, *args, **kwargs):
+    # Profiles a single call (e.g. one Streamlit rerun) and returns its result with the top functions by cumulative time.
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args, **kwargs)
+    output = io.StringIO()
+    pstats.Stats(profiler, stream = output).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    return result, output.getvalue()
@@ -0,0 +1,126 @@
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from constants import JOB_MAX_THREADS, JOB_MAX_PROCESSES, JOB_RETENTION_S
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class Job:
+    def __init__(self, job_id, kind, key):
+        self.id = job_id
+        self.kind = kind
+        self.key = key
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.progress = None
+        self.progress_detail = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def set_progress(self, fraction, detail = None):
+        self.progress = fraction
+        self.progress_detail = detail
+
+class JobScheduler:
+    """Runs jobs off the Streamlit script thread and keeps their status for the UI to poll.
+
+    A job submitted with a key while another job with that key is still pending is
+    coalesced into it, so several saves in a row write once. With report_progress, the
+    job's set_progress is passed to the function as on_progress. The script thread only
+    reads finished jobs. Jobs hand CPU-bound, picklable work to processes(), e.g. ingest
+    categorizes CSV chunks there.
+    """
+
+    def __init__(self, max_threads = JOB_MAX_THREADS, max_processes = JOB_MAX_PROCESSES):
+        self.lock = threading.Lock()
+        self.thread_pool = ThreadPoolExecutor(max_workers = max_threads, thread_name_prefix = "finance-job")
+        self.max_processes = max_processes
+        self.process_pool = None
+        self.jobs = {}
+        self.pending_by_key = {}
+        self.ids = itertools.count(1)
+
+    def submit(self, kind, fn, *args, key = None, report_progress = False, **kwargs):
+        with self.lock:
+            if key is not None and key in self.pending_by_key:
+                return self.pending_by_key[key]
+
+            self._forget_old_jobs()
+            job = Job(next(self.ids), kind, key)
+            if report_progress:
+                kwargs["on_progress"] = job.set_progress
+            self.jobs[job.id] = job
+            if key is not None:
+                self.pending_by_key[key] = job
+
+        self.thread_pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def processes(self):
+        # Started on first use; spawned rather than forked because this process already runs threads.
+        # None on a single core, where shipping work to another process only adds pickling.
+        if self.max_processes < 2:
+            return None
+        with self.lock:
+            if self.process_pool is None:
+                self.process_pool = ProcessPoolExecutor(
+                    max_workers = self.max_processes,
+                    mp_context = multiprocessing.get_context("spawn")
+                )
+            return self.process_pool
+
+    def _run(self, job, fn, args, kwargs):
+        with self.lock:
+            if self.pending_by_key.get(job.key) is job:
+                del self.pending_by_key[job.key]
+            job.status = RUNNING
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            job.error = e
+            job.finished_at = time.time()
+            job.status = FAILED
+        else:
+            job.result = result
+            job.finished_at = time.time()
+            job.status = DONE
+
+    def _forget_old_jobs(self):
+        cutoff = time.time() - JOB_RETENTION_S
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def active(self, kind = None):
+        with self.lock:
+            return [
+                job for job in self.jobs.values()
+                if not job.finished and (kind is None or job.kind == kind)
+            ]
+
+    def wait(self, job, timeout = None):
+        deadline = None if timeout is None else time.time() + timeout
+        while not job.finished:
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def shutdown(self):
+        self.thread_pool.shutdown(wait = True)
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait = True)
@@ -1,23 +1,22 @@
-from categories_utils import CategoriesUtils
-from transaction_manager import TransactionManager
-from budget_manager import BudgetManager
+from app_core import get_app_core
 from tracker_view import TrackerView
-from data_manager import DataManager
-from chatbot_manager import ChatbotManager
+from instrumentation import metrics, profile_call
+
+def render(app_core, tracker_view):
+    with metrics.timer("app.rerun"):
+        tracker_view.handle_file_upload()
+        if app_core.transaction_manager.has_transactions():
+            tracker_view.show_separated_tabs()
 
 def main():
-    categories_utils = CategoriesUtils()
-    budget_manager = BudgetManager()
-    transaction_manager = TransactionManager(categories_utils.get_categories())
-    data_manager = DataManager(
-        transaction_manager.retype_transactions(),
-        budget_manager.get_all_budgets()
-    )
-    chatbot_manager = ChatbotManager(data_manager.get_retriever())
-    tracker_view = TrackerView(transaction_manager, categories_utils, budget_manager, chatbot_manager)
+    app_core = get_app_core()
+    tracker_view = TrackerView(app_core)
     
-    tracker_view.handle_file_upload()
-    if transaction_manager.has_transactions():
-        tracker_view.show_separated_tabs()
+    if tracker_view.profile_requested():
+        _, profile = profile_call(render, app_core, tracker_view)
+        tracker_view.store_profile(profile)
+    else:
+        render(app_core, tracker_view)
+    tracker_view.show_diagnostics()
     
-main()
\ No newline at end of file
+main()
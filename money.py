@@ -0,0 +1,13 @@
+import pandas as pd
+
+def to_cents(amounts):
+    # Integer amounts are already cents; floats are dollars from CSVs or older stores.
+    if pd.api.types.is_integer_dtype(amounts):
+        return amounts.astype("int64")
+    return (amounts.astype(float) * 100).round().astype("int64")
+
+def to_dollars(cents):
+    return cents / 100
+
+def format_amount(cents):
+    return f"${cents / 100:,.2f}"
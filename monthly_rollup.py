@@ -0,0 +1,80 @@
+import os
+
+import pandas as pd
+
+from transaction_store import TransactionStore
+from money import to_dollars
+
+ROLLUP_FILENAME = "monthly_rollup.parquet"
+ROLLUP_KEYS = ["Month", "Type", "Category"]
+ROLLUP_COLUMNS = ROLLUP_KEYS + ["Amount", "Count"]
+
+class MonthlyRollup:
+    """Per month x type x category totals (in cents) and counts, kept next to the transaction store."""
+
+    def __init__(self, root):
+        self.path = os.path.join(root, ROLLUP_FILENAME)
+        self.totals = pd.DataFrame(columns = ROLLUP_COLUMNS)
+
+    @staticmethod
+    def aggregate(df):
+        if df.empty:
+            return pd.DataFrame(columns = ROLLUP_COLUMNS)
+        return (
+            df.assign(Month = TransactionStore.month_keys(df["Transaction Date"]))
+            .groupby(ROLLUP_KEYS, observed = True)["Amount"]
+            .agg(Amount = "sum", Count = "size")
+            .reset_index()
+        )
+
+    def rebuild(self, transactions_df):
+        self.totals = self.aggregate(transactions_df)
+
+    def add(self, transactions_df):
+        self._merge(self.totals, self.aggregate(transactions_df))
+
+    def replace_months(self, transactions_df, months, transaction_type):
+        # Drop the stale rows for these months and type, then re-aggregate only those months.
+        keep = ~(self.totals["Month"].isin(months) & (self.totals["Type"] == transaction_type))
+        in_months = TransactionStore.month_keys(transactions_df["Transaction Date"]).isin(months)
+        self._merge(self.totals[keep], self.aggregate(transactions_df[in_months]))
+
+    def _merge(self, existing, delta):
+        frames = [frame for frame in (existing, delta) if not frame.empty]
+        if not frames:
+            self.totals = pd.DataFrame(columns = ROLLUP_COLUMNS)
+            return
+        self.totals = (
+            pd.concat(frames, ignore_index = True)
+            .groupby(ROLLUP_KEYS, observed = True)[["Amount", "Count"]]
+            .sum()
+            .reset_index()
+        )
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return False
+        totals = pd.read_parquet(self.path)
+        # Rollups written before amounts were stored in cents are rebuilt from the store.
+        if not pd.api.types.is_integer_dtype(totals["Amount"]):
+            return False
+        self.totals = totals
+        return True
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        self.totals.to_parquet(tmp_path, index = False)
+        os.replace(tmp_path, self.path)
+
+    def category_totals(self, transaction_type = "Sale", months = None):
+        totals = self.totals[self.totals["Type"] == transaction_type]
+        if months is not None:
+            totals = totals[totals["Month"].isin(months)]
+        totals = totals.groupby("Category", observed = True)[["Amount", "Count"]].sum().reset_index()
+        return totals.assign(Amount = to_dollars(totals["Amount"]))
+
+    def total(self, transaction_type, months = None):
+        totals = self.totals[self.totals["Type"] == transaction_type]
+        if months is not None:
+            totals = totals[totals["Month"].isin(months)]
+        return float(to_dollars(totals["Amount"].sum()))
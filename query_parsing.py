@@ -0,0 +1,101 @@
+import calendar
+import re
+
+MONTH_NUMBERS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+MONTH_NUMBERS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+MONTH_PATTERN = re.compile(
+    r"\b(" + "|".join(sorted(MONTH_NUMBERS, key=len, reverse=True)) + r")\b(?:\s*,?\s*(\d{4})\b)?",
+    re.IGNORECASE
+)
+# "may" is only a month with a year after it or a preposition before it, so "may I see..." is not a filter.
+MAY_PREPOSITION_PATTERN = re.compile(r"\b(?:in|of|for|during|since|until|through|from|to|and)\s+$", re.IGNORECASE)
+YEAR_PATTERN = re.compile(r"\b((?:19|20)\d{2})\b")
+TOP_N_PATTERNS = [
+    re.compile(r"\btop\s+(\d+)\b", re.IGNORECASE),
+    re.compile(r"\b(\d+)\s+(?:biggest|largest|highest|most expensive)\b", re.IGNORECASE),
+]
+TERM_PATTERN = re.compile(r"[a-z0-9&]+(?:'[a-z]+)*")
+# Question vocabulary; any other word in a query has to resolve to a filter before it is answered from the frames.
+QUERY_WORDS = frozenset("""
+    a about across all am an and any are as at average be been biggest breakdown budget budgets by can categories
+    category charge charges compare cost costs could did do does each expense expenses expensive far for from give
+    get got had has have highest how i im in is it its largest left list may me money most much my of on or our over overall
+    paid pay payment payments per please purchase purchases remaining see show so spend spending spent sum tell than
+    that the there this to top total totals transaction transactions under us was we were what whats when where
+    which why will with would you your
+    advice advise explain recommend should suggest tip tips
+    back cut down high higher increase less low lower lot more reduce save so too up
+""".split())
+
+def month_matches(query):
+    for match in MONTH_PATTERN.finditer(query):
+        if match.group(1).lower() == "may" and not match.group(2) and not MAY_PREPOSITION_PATTERN.search(query[:match.start()]):
+            continue
+        yield match
+
+def remove_months(query):
+    for match in reversed(list(month_matches(query))):
+        query = query[:match.start()] + " " + query[match.end():]
+    return query
+
+def has_time_reference(query):
+    return any(month_matches(query)) or bool(YEAR_PATTERN.search(query))
+
+def extract_months(query, available_months):
+    # available_months are "YYYY-MM" keys; a month without a year means its latest occurrence
+    # and a year on its own means every month of that year.
+    available_months = sorted(available_months)
+    months = []
+
+    for match in month_matches(query):
+        month_number = MONTH_NUMBERS[match.group(1).lower()]
+        candidates = [month for month in available_months if int(month[5:]) == month_number]
+        if match.group(2):
+            candidates = [month for month in candidates if month[:4] == match.group(2)]
+        if candidates:
+            months.append(candidates[-1])
+
+    for year in YEAR_PATTERN.findall(remove_months(query)):
+        months.extend(month for month in available_months if month[:4] == year)
+
+    return sorted(set(months))
+
+def extract_names(query, names):
+    # Longest names first so "Fast Food" is not also reported as "Food".
+    found = []
+    remaining = query.lower()
+    for name in sorted(names, key=len, reverse=True):
+        pattern = re.compile(r"\b" + re.escape(name.lower()) + r"\b")
+        if pattern.search(remaining):
+            found.append(name)
+            remaining = pattern.sub(" ", remaining)
+    return found
+
+def extract_top_n(query):
+    for pattern in TOP_N_PATTERNS:
+        match = pattern.search(query)
+        if match:
+            return int(match.group(1))
+    return None
+
+def unresolved_terms(query, resolved_names):
+    # Words left once question vocabulary, numbers, months, years and the names already used as filters are removed.
+    remaining = YEAR_PATTERN.sub(" ", remove_months(query)).lower()
+    for name in resolved_names:
+        remaining = re.sub(r"\b" + re.escape(name.lower()) + r"\b", " ", remaining)
+    terms = (word.replace("'", "") for word in TERM_PATTERN.findall(remaining))
+    return [term for term in terms if term not in QUERY_WORDS and not term.isdigit()]
+
+def extract_merchants(terms, descriptions):
+    # Descriptions containing any term as a word, plus the terms no description contains.
+    normalized = {description: description.lower().replace("'", "") for description in descriptions if isinstance(description, str)}
+    merchants = []
+    unmatched = []
+    for term in terms:
+        pattern = re.compile(r"\b" + re.escape(term) + r"\b")
+        matches = [description for description, text in normalized.items() if pattern.search(text)]
+        if matches:
+            merchants.extend(matches)
+        else:
+            unmatched.append(term)
+    return list(dict.fromkeys(merchants)), unmatched
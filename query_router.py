@@ -0,0 +1,165 @@
+import re
+
+from query_parsing import (
+    extract_months, extract_names, extract_top_n, extract_merchants, has_time_reference, unresolved_terms
+)
+from transaction_store import TransactionStore
+from money import format_amount
+
+BUDGET_PATTERN = re.compile(r"\bbudgets?\b", re.IGNORECASE)
+TOP_N_PATTERN = re.compile(r"\b(top|biggest|largest|highest|most expensive|most)\b", re.IGNORECASE)
+LIST_PATTERN = re.compile(r"\b(list|show)\b.*\b(transactions|purchases|charges|payments|expenses)\b", re.IGNORECASE)
+AGGREGATE_PATTERN = re.compile(r"\b(how much|total|sum|spend|spent|spending|average|cost)\b", re.IGNORECASE)
+PROSE_PATTERN = re.compile(r"\b(why|should|advice|advise|recommend|suggest|tips?|how can|how do i|explain|compare)\b", re.IGNORECASE)
+PAYMENTS_PATTERN = re.compile(r"\b(payments?|paid off|pay off)\b", re.IGNORECASE)
+CATEGORY_PATTERN = re.compile(r"\bcategor(y|ies)\b", re.IGNORECASE)
+
+DEFAULT_TOP_N = 5
+MAX_LISTED_TRANSACTIONS = 20
+
+class RoutedQuery:
+    def __init__(self, intent, text, direct):
+        self.intent = intent
+        self.text = text
+        self.direct = direct
+
+class QueryRouter:
+    """Answers aggregate, top-N, listing and budget questions straight from the frames."""
+
+    def __init__(self, transaction_manager, budget_manager):
+        self.transaction_manager = transaction_manager
+        self.budget_manager = budget_manager
+
+    def route(self, query):
+        # Answers directly only when every month, year, category, budget and merchant in the query became
+        # a filter; anything else (e.g. "last month", an unknown merchant) is left to retrieval. Prose
+        # questions are answered by the LLM anyway, so their unresolved words are tolerated and the
+        # figures computed from the filters that did resolve are passed to it as context.
+        is_prose = bool(PROSE_PATTERN.search(query))
+        use_payments = bool(PAYMENTS_PATTERN.search(query))
+        transactions = self.transaction_manager.payments if use_payments else self.transaction_manager.expenses
+        if transactions.empty:
+            return None
+
+        months = extract_months(query, self.transaction_manager.get_available_months())
+        if not months and has_time_reference(query):
+            return None
+        categories = [] if use_payments else extract_names(query, transactions["Category"].unique())
+        is_budget_query = not use_payments and bool(BUDGET_PATTERN.search(query))
+        budget_names = extract_names(query, self.budget_manager.list_budgets()) if is_budget_query else []
+        merchants, unmatched = extract_merchants(
+            unresolved_terms(query, categories + budget_names), transactions["Description"].unique()
+        )
+        if (unmatched and not is_prose) or (is_budget_query and merchants):
+            return None
+        filtered = self.filter_transactions(transactions, months, categories, merchants)
+        scope = self.describe_scope(months, categories, merchants)
+
+        if is_budget_query:
+            lines = self.budget_status(budget_names, transactions, months)
+            intent = "budget"
+        elif TOP_N_PATTERN.search(query):
+            lines = self.top_n(filtered, scope, extract_top_n(query) or DEFAULT_TOP_N, bool(CATEGORY_PATTERN.search(query)))
+            intent = "top_n"
+        elif LIST_PATTERN.search(query):
+            lines = self.list_transactions(filtered, scope)
+            intent = "filter"
+        elif AGGREGATE_PATTERN.search(query):
+            lines = self.aggregate(filtered, scope, use_payments, break_down = not categories)
+            intent = "aggregate"
+        else:
+            return None
+
+        if not lines:
+            return None
+        return RoutedQuery(intent, "\n".join(lines), direct = not is_prose)
+
+    @staticmethod
+    def filter_transactions(transactions, months, categories, merchants = None):
+        mask = transactions["Amount"].notna()
+        if months:
+            mask &= TransactionStore.month_keys(transactions["Transaction Date"]).isin(months)
+        if categories:
+            mask &= transactions["Category"].isin(categories)
+        if merchants:
+            mask &= transactions["Description"].isin(merchants)
+        return transactions[mask]
+
+    def describe_scope(self, months, categories, merchants):
+        scope = ""
+        if merchants:
+            scope += f" at {', '.join(merchants[:3])}" + (f" and {len(merchants) - 3} more" if len(merchants) > 3 else "")
+        if categories:
+            scope += f" on {', '.join(categories)}"
+        if months:
+            scope += f" in {', '.join(self.transaction_manager.month_label(month) for month in months)}"
+        return scope
+
+    @staticmethod
+    def aggregate(transactions, scope, use_payments, break_down):
+        total = transactions["Amount"].sum()
+        verb = "paid" if use_payments else "spent"
+        lines = [f"You {verb} {format_amount(total)} across {len(transactions)} transactions{scope}."]
+        if len(transactions):
+            lines.append(f"Average per transaction: {format_amount(total / len(transactions))}.")
+
+        if break_down and not use_payments:
+            category_totals = transactions.groupby("Category", observed = True)["Amount"].sum().sort_values(ascending = False)
+            if len(category_totals) > 1:
+                lines.append("By category:")
+                lines.extend(f"- {category}: {format_amount(amount)}" for category, amount in category_totals.items())
+        return lines
+
+    @staticmethod
+    def top_n(transactions, scope, n, by_category):
+        if transactions.empty:
+            return [f"No transactions found{scope}."]
+
+        if by_category:
+            category_totals = transactions.groupby("Category", observed = True)["Amount"].sum().nlargest(n)
+            return [f"Top {len(category_totals)} categories by spend{scope}:"] + [
+                f"{rank}. {category}: {format_amount(amount)}"
+                for rank, (category, amount) in enumerate(category_totals.items(), start = 1)
+            ]
+
+        largest = transactions.nlargest(n, "Amount")
+        return [f"Top {len(largest)} transactions{scope}:"] + [
+            f"{rank}. {row['Transaction Date']:%m/%d/%Y} {row['Description']} ({row['Category']}): {format_amount(row['Amount'])}"
+            for rank, (_, row) in enumerate(largest.iterrows(), start = 1)
+        ]
+
+    @staticmethod
+    def list_transactions(transactions, scope):
+        if transactions.empty:
+            return [f"No transactions found{scope}."]
+
+        listed = transactions.sort_values("Transaction Date").head(MAX_LISTED_TRANSACTIONS)
+        lines = [f"{len(transactions)} transactions{scope} totalling {format_amount(transactions['Amount'].sum())}:"]
+        lines.extend(
+            f"- {row['Transaction Date']:%m/%d/%Y} {row['Description']} ({row['Category']}): {format_amount(row['Amount'])}"
+            for _, row in listed.iterrows()
+        )
+        if len(transactions) > MAX_LISTED_TRANSACTIONS:
+            lines.append(f"...and {len(transactions) - MAX_LISTED_TRANSACTIONS} more.")
+        return lines
+
+    def budget_status(self, budget_names, transactions, months):
+        budgets = self.budget_manager.get_all_budgets()
+        if not budgets:
+            return None
+
+        budget_names = budget_names or list(budgets.keys())
+        months = months or self.transaction_manager.get_available_months()[-1:]
+        spent = self.filter_transactions(transactions, months, []).groupby("Category", observed = True)["Amount"].sum()
+        month_labels = ", ".join(self.transaction_manager.month_label(month) for month in months)
+
+        lines = []
+        for budget_name in budget_names:
+            lines.append(f"Budget {budget_name} in {month_labels}:")
+            for category, limit in budgets[budget_name].items():
+                category_spent = spent.get(category, 0)
+                planned = round(float(limit) * 100) * len(months)
+                remaining = planned - category_spent
+                status = f"{format_amount(remaining)} remaining" if remaining >= 0 else f"over by {format_amount(-remaining)}"
+                lines.append(f"- {category}: spent {format_amount(category_spent)} of {format_amount(planned)}, {status}")
+        return lines
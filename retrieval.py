@@ -0,0 +1,125 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from query_parsing import extract_months, extract_names
+from instrumentation import instrumented
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+class BM25Index:
+    def __init__(self, texts):
+        postings = defaultdict(lambda: ([], []))
+        self.lengths = np.zeros(len(texts))
+        for position, text in enumerate(texts):
+            tokens = tokenize(text)
+            self.lengths[position] = len(tokens)
+            for token, frequency in Counter(tokens).items():
+                postings[token][0].append(position)
+                postings[token][1].append(frequency)
+
+        self.size = len(texts)
+        self.average_length = self.lengths.mean() if self.size else 0.0
+        self.postings = {
+            token: (np.array(positions), np.array(frequencies, dtype=float))
+            for token, (positions, frequencies) in postings.items()
+        }
+
+    def scores(self, query):
+        scores = np.zeros(self.size)
+        for token in set(tokenize(query)):
+            if token not in self.postings:
+                continue
+
+            positions, frequencies = self.postings[token]
+            idf = math.log(1 + (self.size - len(positions) + 0.5) / (len(positions) + 0.5))
+            length_norm = 1 - BM25_B + BM25_B * self.lengths[positions] / self.average_length
+            scores[positions] += idf * frequencies * (BM25_K1 + 1) / (frequencies + BM25_K1 * length_norm)
+        return scores
+
+class HybridRetriever:
+    """Filters by month and category taken from the query, then fuses vector and BM25 rankings."""
+
+    def __init__(self, data_manager, k=4, fetch_k=20, use_bm25=True):
+        self.data_manager = data_manager
+        self.k = k
+        self.fetch_k = fetch_k
+        self.use_bm25 = use_bm25
+        self.indexed_version = None
+
+    def _refresh_index(self):
+        if self.indexed_version == self.data_manager.version:
+            return
+
+        documents = self.data_manager.documents
+        self.metadata = pd.DataFrame(
+            [doc.metadata for doc in documents], columns=["kind", "month", "category", "description"]
+        )
+        self.months = sorted(self.metadata["month"].dropna().unique())
+        self.categories = list(self.metadata["category"].dropna().unique())
+        self.bm25 = BM25Index(
+            [doc.metadata.get("description") or doc.page_content for doc in documents]
+        ) if self.use_bm25 else None
+        self.indexed_version = self.data_manager.version
+
+    def extract_filters(self, query):
+        return extract_months(query, self.months), extract_names(query, self.categories)
+
+    @staticmethod
+    def build_where(months, categories):
+        # Budgets carry no month, so a month filter must not hide them.
+        conditions = []
+        if months:
+            conditions.append({"$or": [{"month": {"$in": months}}, {"kind": "budget"}]})
+        if categories:
+            conditions.append({"category": {"$in": categories}})
+
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def metadata_mask(self, months, categories):
+        mask = np.ones(len(self.metadata), dtype=bool)
+        if months:
+            mask &= (self.metadata["month"].isin(months) | (self.metadata["kind"] == "budget")).to_numpy()
+        if categories:
+            mask &= self.metadata["category"].isin(categories).to_numpy()
+        return mask
+
+    @instrumented("retrieval.search")
+    def get_relevant_documents(self, query):
+        self._refresh_index()
+        months, categories = self.extract_filters(query)
+
+        rankings = [self.data_manager.vector_db.similarity_search(
+            query, k=self.fetch_k, filter=self.build_where(months, categories)
+        )]
+        if self.bm25 is not None and self.bm25.size:
+            scores = np.where(self.metadata_mask(months, categories), self.bm25.scores(query), 0.0)
+            top_count = min(self.fetch_k, len(scores))
+            top_positions = np.argpartition(-scores, top_count - 1)[:top_count]
+            top_positions = top_positions[np.argsort(-scores[top_positions])]
+            rankings.append([self.data_manager.documents[i] for i in top_positions if scores[i] > 0])
+
+        return self.fuse(rankings)[:self.k]
+
+    @staticmethod
+    def fuse(rankings):
+        # Reciprocal rank fusion: only ranks matter, so vector distances and BM25 scores need no calibration.
+        fused_scores = defaultdict(float)
+        documents = {}
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking):
+                fused_scores[doc.page_content] += 1 / (RRF_K + rank + 1)
+                documents.setdefault(doc.page_content, doc)
+
+        return [documents[key] for key in sorted(fused_scores, key=fused_scores.get, reverse=True)]
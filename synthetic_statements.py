@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+MERCHANTS_PER_RULE = 3
+PAYMENT_SHARE = 0.05
+UNCATEGORIZED_SHARE = 0.1
+
+def synthetic_categories(category_count):
+    # Every category gets exact, prefix and substring rules, so all three matcher paths are exercised.
+    return {
+        f"Category {i}": (
+            [f"store {i}-{j}" for j in range(MERCHANTS_PER_RULE)]
+            + [f"prefix:fuel {i} #"]
+            + [f"contains:market{i}z"]
+        )
+        for i in range(category_count)
+    }
+
+def merchant_vocabulary(category_count, rng):
+    names = []
+    for i in range(category_count):
+        names.extend(f"Store {i}-{j}" for j in range(MERCHANTS_PER_RULE))
+        names.extend(f"FUEL {i} #{rng.integers(100, 999)}" for _ in range(MERCHANTS_PER_RULE))
+        names.extend(f"POS PURCHASE MARKET{i}Z {rng.integers(1000, 9999)}" for _ in range(MERCHANTS_PER_RULE))
+    names.extend(f"Misc Vendor {rng.integers(10000, 99999)}" for _ in range(max(1, int(len(names) * UNCATEGORIZED_SHARE))))
+    return np.array(names, dtype=object)
+
+def write_statements(csv_dir, rows, category_count, months=12, seed=0):
+    """Writes one CSV per month in the bank export format (Transaction Date, Description, Amount, Type).
+
+    Rows are generated month by month with numpy, so 10M rows never sit in memory at once.
+    Returns the matching categories.json content.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(csv_dir, exist_ok=True)
+    merchants = merchant_vocabulary(category_count, rng)
+    rows_per_month = np.full(months, rows // months)
+    rows_per_month[:rows % months] += 1
+
+    for period, month_rows in zip(pd.period_range("2000-01", periods=months, freq="M"), rows_per_month):
+        day_labels = np.array([f"{period.month:02d}/{day:02d}/{period.year}" for day in range(1, period.days_in_month + 1)])
+        is_payment = rng.random(month_rows) < PAYMENT_SHARE
+        amounts = np.round(rng.uniform(5, 500, month_rows), 2)
+
+        pd.DataFrame({
+            "Transaction Date": day_labels[rng.integers(0, len(day_labels), month_rows)],
+            "Description": np.where(is_payment, "Payment Thank You", merchants[rng.integers(0, len(merchants), month_rows)]),
+            "Amount": np.where(is_payment, amounts, -amounts),
+            "Type": np.where(is_payment, "Payment", "Sale"),
+        }).to_csv(os.path.join(csv_dir, f"{period.strftime('%B_%Y')}_Transactions.csv"), index=False)
+
+    return synthetic_categories(category_count)
+
+def synthetic_budgets(categories, budget_count=3, seed=0):
+    rng = np.random.default_rng(seed)
+    names = list(categories)
+    return {
+        f"Budget {b}": {
+            category: f"{limit:.2f}"
+            for category, limit in zip(
+                rng.choice(names, size=min(len(names), 20), replace=False),
+                rng.uniform(100, 2000, min(len(names), 20))
+            )
+        }
+        for b in range(budget_count)
+    }
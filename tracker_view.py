@@ -1,32 +1,77 @@
-import time
 import streamlit as st
 import plotly.express as px
 import pandas as pd
-import threading
-from constants import PREVIOUS_TRANSACTIONS_PATH
+
+from app_core import CHATBOT_LOADING, CHATBOT_FAILED
+from job_scheduler import DONE, FAILED
+from instrumentation import metrics
+from budget_engine import BudgetEngine, NOT_IN_BUDGET, NO_TRANSACTIONS
+from money import to_dollars
+
+JOB_POLL_SECONDS = 0.5
 
 class TrackerView:
-    def __init__(self, transaction_manager, categories_utils, budget_manager, chatbot_manager):
+    def __init__(self, app_core):
         st.set_page_config(page_title="Finance Tracker", layout="wide")
         st.title("Finance Dashboard")
-        self.transaction_manager = transaction_manager
-        self.categories_utils = categories_utils
-        self.budget_manager = budget_manager
-        self.chatbot_manager = chatbot_manager
+        self.app_core = app_core
+        self.transaction_manager = app_core.transaction_manager
+        self.categories_utils = app_core.categories_utils
+        self.budget_manager = app_core.budget_manager
+        self.budget_engine = BudgetEngine(self.transaction_manager.rollup)
         
     def handle_file_upload(self):
         uploaded_file = st.file_uploader("Upload your transaction CSV file", type=["csv"])
         
+        if "processed_uploads" not in st.session_state:
+            st.session_state.processed_uploads = set()
+        if "upload_jobs" not in st.session_state:
+            st.session_state.upload_jobs = {}
+        if "job_notices" not in st.session_state:
+            st.session_state.job_notices = []
+            
+        for level, notice in st.session_state.job_notices:
+            if level == DONE:
+                st.success(notice)
+            else:
+                st.error(notice)
+        st.session_state.job_notices = []
+        
+        # The uploader returns the same file on every rerun; the shared core must only ingest it once.
         if uploaded_file is not None:
-            try:
-                self.transaction_manager.add_transactions(
-                    uploaded_file, 
-                    self.categories_utils.get_categories()
-                )
-                self.transaction_manager.save_transactions()
-            except Exception as e:
-                st.error(f"Error processing file: {str(e)}")
-                raise e
+            upload_key = (uploaded_file.name, uploaded_file.size)
+            if upload_key not in st.session_state.processed_uploads and upload_key not in st.session_state.upload_jobs:
+                st.session_state.upload_jobs[upload_key] = self.app_core.submit_upload(uploaded_file).id
+        
+        self.show_job_status()
+                
+    def show_job_status(self):
+        active = st.session_state.upload_jobs or self.app_core.jobs.active("save")
+        st.fragment(self.render_job_status, run_every = JOB_POLL_SECONDS if active else None)()
+        
+    def render_job_status(self):
+        # Polled while jobs run; results are handed back here, on the script thread, once a job finishes.
+        finished = False
+        for upload_key, job_id in list(st.session_state.upload_jobs.items()):
+            job = self.app_core.jobs.get(job_id)
+            name = upload_key[0]
+            if job is None or job.finished:
+                del st.session_state.upload_jobs[upload_key]
+                st.session_state.processed_uploads.add(upload_key)
+                if job is not None and job.status == DONE:
+                    st.session_state.job_notices.append((DONE, f"Imported {name}: {job.result}."))
+                else:
+                    error = job.error if job is not None else "job expired"
+                    st.session_state.job_notices.append((FAILED, f"Error processing file {name}: {error}"))
+                finished = True
+            else:
+                rows = f": {job.progress_detail:,} rows" if job.progress_detail else "..."
+                st.progress(job.progress or 0.0, text = f"Importing {name}{rows}")
+                
+        if self.app_core.jobs.active("save"):
+            st.caption("Saving changes...")
+        if finished:
+            st.rerun()
                 
     def show_separated_tabs(self):
         self.expenses_tab, self.payments_tab, self.budgets_tab, self.chatbot_tab = st.tabs(
@@ -37,16 +82,28 @@ class TrackerView:
         self.show_budgets_tab()
         self.show_chatbot_tab()
                 
+    @staticmethod
+    def display_frame(transactions_df, columns = None):
+        # Amounts are kept in integer cents; only the rendered copy is converted to dollars.
+        display_df = (transactions_df if columns is None else transactions_df[columns]).copy()
+        display_df["Amount"] = to_dollars(display_df["Amount"])
+        for column in display_df.columns.intersection(["Description", "Category"]):
+            display_df[column] = display_df[column].astype(str)
+        return display_df
+    
     def show_expenses_tab(self):
-        expenses = self.transaction_manager.expenses
+        expenses = self.display_frame(self.transaction_manager.expenses)
         with self.expenses_tab:
             self.create_add_category()
             self.create_expenses_table(expenses)
-            self.create_expenses_summary(expenses)
+            self.create_expenses_summary(self.transaction_manager.rollup.category_totals("Sale"))
     
     def show_payments_tab(self):
         with self.payments_tab:
-            self.create_payment_summary(self.transaction_manager.payments)
+            self.create_payment_summary(
+                self.transaction_manager.payments,
+                self.transaction_manager.rollup.total("Payment")
+            )
             
     def show_budgets_tab(self):
         with self.budgets_tab:
@@ -62,8 +119,9 @@ class TrackerView:
         
         if add_button and new_category:
             if new_category not in self.categories_utils.get_categories():
-                self.categories_utils.add_category(new_category)
-                self.categories_utils.save_categories()
+                with self.app_core.lock:
+                    self.categories_utils.add_category(new_category)
+                    self.categories_utils.save_categories()
                 st.rerun()
                 
     def create_expenses_table(self, expenses_df):
@@ -85,21 +143,13 @@ class TrackerView:
         )
         save_button = st.button("Apply Changes", type = "primary")
         if save_button:
-            for idx, row in edited_df.iterrows():
-                new_category = row["Category"]
-                if new_category == expenses_df.at[idx, "Category"]:
-                    continue
-                
-                description = row["Description"]
-                self.transaction_manager.update_expense_transaction(idx, new_category)
-                self.categories_utils.add_keyword_to_category(new_category, description)
-                self.categories_utils.save_categories()
-                self.transaction_manager.save_transactions()
+            changed = edited_df["Category"] != expenses_df["Category"]
+            if changed.any():
+                self.app_core.apply_category_changes(edited_df.loc[changed, ["Description", "Category"]])
                 
-    def create_expenses_summary(self, expenses_df):
+    def create_expenses_summary(self, category_totals):
         st.subheader("Expense Summary")
-        category_totals = expenses_df.groupby("Category")["Amount"].sum().reset_index()
-        category_totals = category_totals.sort_values("Amount", ascending = False)
+        category_totals = category_totals[["Category", "Amount"]].sort_values("Amount", ascending = False)
         
         st.dataframe(
             category_totals,
@@ -118,12 +168,11 @@ class TrackerView:
         )
         st.plotly_chart(fig, use_container_width = True)
         
-    def create_payment_summary(self, payments_df):
+    def create_payment_summary(self, payments_df, total_payments):
         st.subheader("Payments Summary")
-        total_payments = payments_df["Amount"].sum()
         st.metric("Total Payments", f"${total_payments:,.2f}")
         st.dataframe(
-            payments_df[["Transaction Date", "Amount"]],
+            self.display_frame(payments_df, ["Transaction Date", "Amount"]),
             column_config = {
                 "Transaction Date": st.column_config.DateColumn("Transaction Date", format = "MM/DD/YYYY"),
                 "Amount": st.column_config.NumberColumn("Amount", format = "$%.2f")
@@ -134,10 +183,10 @@ class TrackerView:
         
     def display_budgets(self):
         self.show_create_budget_form()
-        current_budget, current_monthly_transactions = self.show_selectors()
+        current_budgets, current_months = self.show_selectors()
         
-        if current_budget and current_monthly_transactions is not None:
-            self.display_budget_calculations(current_budget, current_monthly_transactions)
+        if current_budgets and current_months:
+            self.display_budget_calculations(current_budgets, current_months)
             
     def show_selectors(self):
         saved_budgets = self.budget_manager.list_budgets()
@@ -154,22 +203,17 @@ class TrackerView:
         return None, None
         
     def show_budget_selector(self, saved_budgets):
-        selected = st.selectbox("Select existing budget:", saved_budgets)
-        loaded = self.budget_manager.load_budget(selected)
-        if loaded:
-            return loaded
+        selected = st.multiselect("Select existing budgets:", saved_budgets, default = saved_budgets[:1])
+        loaded = {name: self.budget_manager.load_budget(name) for name in selected}
+        return {name: budget for name, budget in loaded.items() if budget}
     
     def show_month_selector(self, available_months):
-        selected = st.selectbox("Select month of transactions:", available_months)
-        selected_transactions_month_filepath = selected.replace(" ", "_") + "_Transactions.csv"
-        loaded_expenses, _ = self.transaction_manager.separate_transactions(
-            self.transaction_manager.load_transactions(
-                PREVIOUS_TRANSACTIONS_PATH + "/" + selected_transactions_month_filepath,
-                self.categories_utils.get_categories()
-            )
+        return st.multiselect(
+            "Select months of transactions:", 
+            available_months, 
+            default = available_months[-1:],
+            format_func = self.transaction_manager.month_label
         )
-        if loaded_expenses is not None:
-            return loaded_expenses
         
     def show_create_budget_form(self):
         with st.expander("Add Budget"):
@@ -208,69 +252,94 @@ class TrackerView:
                     for problem in save_result:
                         st.error(problem)
                 else:
+                    self.app_core.invalidate_index()
                     st.success(f"Successfully saved budget {budget_name}!")
                     st.session_state.num_categories = 0
                     budget = {}
                     
-    def display_budget_calculations(self, budget, monthly_transactions):
-        categorized_transactions = monthly_transactions[monthly_transactions["Category"] != "Uncategorized"]
+    def display_budget_calculations(self, budgets, months):
+        evaluation = self.budget_engine.evaluate(budgets, months)
         
-        budget_categories = set(budget.keys())
-        transaction_categories = set(categorized_transactions["Category"].unique())
-
-        missing_in_transactions = budget_categories - transaction_categories
-        missing_in_budget = transaction_categories - budget_categories
+        missing_in_transactions = set(evaluation.loc[evaluation["Status"] == NO_TRANSACTIONS, "Category"])
+        missing_in_budget = set(evaluation.loc[evaluation["Status"] == NOT_IN_BUDGET, "Category"])
 
         if missing_in_transactions:
             st.warning(f"Categories in budget but not in transactions: {missing_in_transactions}")
         if missing_in_budget:
             st.warning(f"Categories in transactions but not in budget: {missing_in_budget}")
 
-        if not missing_in_budget and not missing_in_transactions:
-            spent_per_category = categorized_transactions.groupby('Category')['Amount'].sum().reset_index()
-            spent_per_category.rename(columns={'Amount': 'Spent'}, inplace=True)
-
-            summary = pd.DataFrame(columns=["Category", "Budget", "Spent", "Remaining"])
+        summary = self.budget_engine.in_dollars(evaluation).assign(
+            Month = evaluation["Month"].map(self.transaction_manager.month_label),
+            Progress = evaluation["Remaining"].map(lambda remaining: "✔" if remaining >= 0 else "✖")
+        )
+        st.subheader("Summary")
+        st.dataframe(
+            summary[["Budget Name", "Month", "Category", "Budget", "Spent", "Remaining", "Overrun", "Progress", "Status"]], 
+            column_config={
+                "Budget": st.column_config.NumberColumn("Budget", format = "$%.2f"),
+                "Spent": st.column_config.NumberColumn("Amount", format = "$%.2f"),
+                "Remaining": st.column_config.NumberColumn("Remaining", format = "$%.2f"),
+                "Overrun": st.column_config.NumberColumn("Overrun", format = "$%.2f")
+            },
+            hide_index = True
+        )
+        
+        if len(months) > 1:
+            self.display_budget_trend(evaluation)
 
-            for cat, limit in budget.items():
-                limit_float = float(limit)
-                spent = float(spent_per_category[spent_per_category["Category"] == cat]["Spent"])
-                remaining = float(limit_float - spent)
-                summary = pd.concat([summary, pd.DataFrame([{
-                    "Category": cat,
-                    "Budget": limit_float,
-                    "Spent": spent,
-                    "Remaining": remaining,
-                    "Progress": "✔" if remaining >= 0 else "✖"
-                }])], ignore_index=True)
+        st.subheader("Category Breakdown")
+        budget_categories = sorted({category for budget in budgets.values() for category in budget})
+        category_counts = evaluation.drop_duplicates(["Month", "Category"]).groupby("Category")["Count"].sum()
+        selected_transactions = self.transaction_manager.load_expenses(months)
+        for cat in budget_categories:
+            cat_transactions = selected_transactions[selected_transactions["Category"] == cat]
+            with st.expander(f"{cat} ({int(category_counts.get(cat, 0))} transactions)"):
+                st.dataframe(
+                    self.display_frame(cat_transactions, ["Transaction Date", "Description", "Amount"]),
+                    column_config={
+                        "Transaction Date": st.column_config.DateColumn("Transaction Date", format = "MM/DD/YYYY"),
+                        "Amount": st.column_config.NumberColumn("Amount", format = "$%.2f")
+                    },
+                    hide_index = True
+                )
                 
-            st.subheader("Summary")
-            st.dataframe(
-                summary, 
-                column_config={
-                    "Budget": st.column_config.NumberColumn("Budget", format = "$%.2f"),
-                    "Spent": st.column_config.NumberColumn("Amount", format = "$%.2f"),
-                    "Remaining": st.column_config.NumberColumn("Remaining", format = "$%.2f")
-                },
-                hide_index = True
-            )
-
-            st.subheader("Category Breakdown")
-            for cat in budget.keys():
-                cat_transactions = monthly_transactions[monthly_transactions["Category"] == cat]
-                with st.expander(f"{cat} ({len(cat_transactions)} transactions)"):
-                    st.dataframe(
-                        cat_transactions[["Transaction Date", "Description", "Amount"]],
-                        column_config={
-                            "Transaction Date": st.column_config.DateColumn("Transaction Date", format = "MM/DD/YYYY"),
-                            "Amount": st.column_config.NumberColumn("Amount", format = "$%.2f")
-                        },
-                        hide_index = True
-                    )
+    def display_budget_trend(self, evaluation):
+        st.subheader("Trend")
+        trend = self.budget_engine.in_dollars(self.budget_engine.monthly_trend(evaluation))
+        trend["Month"] = trend["Month"].map(self.transaction_manager.month_label)
+        
+        spent_by_month = to_dollars(evaluation.pivot_table(
+            index = "Category", columns = "Month", values = "Spent", aggfunc = "max", fill_value = 0
+        ))
+        spent_by_month.columns = [self.transaction_manager.month_label(month) for month in spent_by_month.columns]
+        st.dataframe(spent_by_month, use_container_width = True)
+        
+        fig = px.bar(
+            trend.melt(id_vars = ["Budget Name", "Month"], value_vars = ["Budget", "Spent"]),
+            x = "Month",
+            y = "value",
+            color = "variable",
+            barmode = "group",
+            facet_row = "Budget Name",
+            labels = {"value": "Amount", "variable": ""},
+            title = "Budget vs. Spent by Month"
+        )
+        st.plotly_chart(fig, use_container_width = True)
                     
     def display_chatbot(self):
-        if "chatbot" not in st.session_state:
+        if "messages" not in st.session_state:
             st.session_state.messages = []
+            
+        # st.tabs renders this on every rerun, so nothing is loaded until the assistant is asked for.
+        if self.app_core.assistant_requested() or st.button("Start assistant"):
+            self.app_core.warm_up_chatbot()
+            status = self.app_core.chatbot_status()
+            if status == CHATBOT_LOADING:
+                st.caption("Loading the assistant in the background...")
+            elif status == CHATBOT_FAILED:
+                st.warning(f"The assistant failed to load ({self.app_core.warmup_error}). Sending a message retries.")
+        else:
+            st.caption("The assistant loads when you start it or send your first message.")
 
         for msg in st.session_state.messages:
             with st.chat_message(msg["role"]):
@@ -283,11 +352,64 @@ class TrackerView:
 
             with st.chat_message("assistant"):
                 placeholder = st.empty()
-                for i in range(9):
-                    placeholder.markdown("Bot is thinking" + "." * (i % 3 + 1))
-                    time.sleep(0.5)
-
-                response = self.chatbot_manager.ask(st.session_state.messages)
+                placeholder.markdown("Bot is thinking...")
+                
+                timings = {}
+                response = ""
+                with st.spinner("Preparing the assistant..."):
+                    chatbot_manager = self.app_core.get_chatbot_manager()
+                for token in chatbot_manager.ask_stream(st.session_state.messages, timings):
+                    response += token
+                    placeholder.markdown(response + "▌")
 
                 placeholder.markdown(response)
-                st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
+                st.caption(self.format_chat_timings(timings))
+                st.session_state.messages.append({"role": "assistant", "content": response})
+                
+    def profile_requested(self):
+        return st.session_state.pop("profile_next_rerun", False)
+    
+    def store_profile(self, profile):
+        st.session_state.last_profile = profile
+        
+    def show_diagnostics(self):
+        with st.sidebar:
+            if not st.toggle("Diagnostics", key = "show_diagnostics"):
+                return
+            
+            snapshot = metrics.snapshot()
+            if snapshot["peak_rss_bytes"] is not None:
+                st.metric("Peak memory", f"{snapshot['peak_rss_bytes'] / 2**20:,.0f} MiB")
+            
+            timers = pd.DataFrame.from_dict(snapshot["timers"], orient = "index")
+            if not timers.empty:
+                st.caption("Timers (seconds)")
+                st.dataframe(
+                    timers[["calls", "total_s", "mean_s", "max_s", "last_s"]].sort_values("total_s", ascending = False),
+                    use_container_width = True
+                )
+            if snapshot["counters"]:
+                st.caption("Counters")
+                st.dataframe(pd.Series(snapshot["counters"], name = "count"), use_container_width = True)
+            
+            st.download_button("Export JSON", metrics.to_json(), file_name = "finance_tracker_metrics.json", mime = "application/json")
+            if st.button("Profile next rerun"):
+                st.session_state.profile_next_rerun = True
+                st.rerun()
+            if "last_profile" in st.session_state:
+                with st.expander("Last profiled rerun"):
+                    st.code(st.session_state.last_profile)
+                
+    @staticmethod
+    def format_chat_timings(timings):
+        labels = {
+            "routing": "computed directly",
+            "retrieval": "retrieval",
+            "prompt_build": "prompt",
+            "time_to_first_token": "first token",
+            "generation": "generation",
+            "total": "total"
+        }
+        return " · ".join(
+            f"{label} {timings[key]:.2f}s" for key, label in labels.items() if key in timings
+        )
@@ -1,27 +1,122 @@
 import pandas as pd
 import os
+import threading
+from collections import deque
+from pandas.api.types import union_categoricals
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
-from constants import TRANSACTION_DF_COLUMNS, PREVIOUS_TRANSACTIONS_PATH
+from constants import (
+    TRANSACTION_DF_COLUMNS, PREVIOUS_TRANSACTIONS_PATH, INGEST_MAX_WORKERS, PARALLEL_INGEST_MIN_FILES,
+    INGEST_CHUNK_ROWS, CSV_DTYPES
+)
+from categorizer import Categorizer, normalize_descriptions
+from transaction_store import TransactionStore, STORE_COLUMNS, CATEGORICAL_COLUMNS, compact_transactions
+from money import to_cents, to_dollars
+from monthly_rollup import MonthlyRollup
+from dedup_index import FingerprintIndex, IngestReport
+from instrumentation import metrics, instrumented, timed_iter
+
+# Identifies a row across reloads, so unsaved category edits can be re-applied to a fresher frame.
+EDIT_KEY_COLUMNS = ["Transaction Date", "Description", "Amount", "Type"]
 
 class TransactionManager:
-    def __init__(self, categories):
-        self.expenses = pd.DataFrame(columns = TRANSACTION_DF_COLUMNS)
-        self.payments = pd.DataFrame(columns = TRANSACTION_DF_COLUMNS)
+    def __init__(self, categories, store = None, history_dir = PREVIOUS_TRANSACTIONS_PATH):
+        self.store = store or TransactionStore()
+        # Guards the frame, the partitions and the rollup/fingerprint files against concurrent background jobs.
+        self.lock = threading.RLock()
+        self.history_dir = history_dir
+        self.rollup = MonthlyRollup(self.store.root)
+        self.fingerprints = FingerprintIndex(self.store.root)
+        self.transactions = compact_transactions(pd.DataFrame(columns = STORE_COLUMNS))
+        self.version = 0
+        self.type_views = {}
+        self.dirty_months = set()
+        self.pending_edits = []
+        self.store_version = None
         self.get_previous_transactions(categories)
         
+    @instrumented("transactions.get_previous")
     def get_previous_transactions(self, categories):
-        for entry in os.listdir(PREVIOUS_TRANSACTIONS_PATH):
-            full_path = os.path.join(PREVIOUS_TRANSACTIONS_PATH, entry)
-            self.add_transactions(full_path, categories)
+        with self.store.lock():
+            if self.store.needs_migration(self.history_dir):
+                self.migrate_csv_history(self.history_dir, categories)
+            self.sync_with_store()
+        
+    def reload_from_store(self):
+        self.store_version = self.store.version()
+        stored_transactions = self.store.load()
+        self.set_transactions(stored_transactions)
+        if not self.rollup.load():
+            self.rollup.rebuild(stored_transactions)
+            self.rollup.save()
+        if not self.fingerprints.load():
+            self.fingerprints.rebuild(stored_transactions)
+            self.fingerprints.save()
+        
+    def sync_with_store(self):
+        # Called with the store lock held, before any write. If another process (e.g. the CLI)
+        # wrote since this frame was loaded, reload it and re-apply the edits not yet saved.
+        if self.store.version() == self.store_version:
+            return
+        self.reload_from_store()
+        if not self.pending_edits:
+            return
+        
+        edits = pd.concat(self.pending_edits, ignore_index = True)
+        edits = edits.drop_duplicates(EDIT_KEY_COLUMNS, keep = "last")
+        edited_categories = pd.Series(
+            edits["Category"].to_numpy(),
+            index = pd.util.hash_pandas_object(edits[EDIT_KEY_COLUMNS], index = False).to_numpy()
+        )
+        new_categories = pd.Series(
+            pd.util.hash_pandas_object(self.transactions[EDIT_KEY_COLUMNS], index = False).to_numpy(),
+            index = self.transactions.index
+        ).map(edited_categories)
+        matched = new_categories.notna()
+        if matched.any():
+            self.assign_categories(self.transactions.index[matched], new_categories[matched].to_numpy())
+        
+    def migrate_csv_history(self, csv_dir, categories):
+        self.add_transactions_batch(
+            [os.path.join(csv_dir, entry) for entry in sorted(os.listdir(csv_dir))],
+            categories
+        )
+        self.save_transactions()
+        self.store.mark_migrated()
             
+    @instrumented("transactions.save")
     def save_transactions(self):
-        df_to_save = self.retype_transactions()
-        df_to_save["Transaction Date"] = df_to_save["Transaction Date"].dt.strftime("%m/%d/%Y")
+        with self.store.lock(), self.lock:
+            if not self.dirty_months:
+                return
+            
+            self.sync_with_store()
+            self.store.write_partitions(self.transactions, self.dirty_months)
+            self.rollup.save()
+            self.fingerprints.save()
+            self.store_version = self.store.bump_version()
+            self.dirty_months.clear()
+            self.pending_edits = []
+        
+    @staticmethod
+    def export_transactions(transactions, csv_dir = PREVIOUS_TRANSACTIONS_PATH):
+        # Writes one CSV per month in the statement layout; returns how many files were written.
+        os.makedirs(csv_dir, exist_ok = True)
+        df_to_save = transactions.assign(
+            **{
+                "Transaction Date": transactions["Transaction Date"].dt.strftime("%m/%d/%Y"),
+                "Amount": to_dollars(transactions["Amount"])
+            }
+        )
 
-        for period, monthly_df in self.group_transactions_by_month(df_to_save):
-            monthly_df.to_csv(f"{PREVIOUS_TRANSACTIONS_PATH}/{period}_Transactions.csv", index = False)
+        monthly_groups = TransactionManager.group_transactions_by_month(df_to_save)
+        for period, monthly_df in monthly_groups:
+            monthly_df.to_csv(f"{csv_dir}/{period}_Transactions.csv", index = False)
+        return len(monthly_groups)
         
-    def group_transactions_by_month(self, df_to_save):
+    @staticmethod
+    def group_transactions_by_month(df_to_save):
         return [
             (str(period_dt), group.reset_index(drop=True))
             for period_dt, group in df_to_save.groupby(
@@ -30,64 +125,273 @@ class TransactionManager:
         ]
     
     def add_transactions(self, file, categories = {}):
-        df = self.load_transactions(file, categories)
-        curr_expenses, curr_payments = self.separate_transactions(df) 
+        return self.add_transactions_batch([file], categories)
+        
+    def add_transactions_batch(self, files, categories = {}, max_workers = INGEST_MAX_WORKERS):
+        report = IngestReport()
+        frames = []
+        with self.store.lock():
+            with self.lock:
+                self.sync_with_store()
+            # Files are deduplicated one after another so overlapping exports in one batch still collapse.
+            for frame, skipped in self.load_transactions_batch(files, categories, max_workers):
+                session = self.fingerprints.start_session()
+                frames.append(session.filter(frame[frame["Type"].isin(["Sale", "Payment"])]))
+                report.add(session.commit())
+                report.skipped += skipped
+            if not frames:
+                return report
+            
+            df = compact_transactions(pd.concat(frames, ignore_index = True)[STORE_COLUMNS])
+            with self.lock:
+                self.publish_transactions(df, self.store.stage_partitions(df))
+        return report
+        
+    def ingest_transactions_stream(self, file, categories = {}, chunk_rows = INGEST_CHUNK_ROWS, on_progress = None,
+                                   executor = None):
+        # Each chunk is cleaned, categorized and staged to its month partitions as the file is read.
+        # With an executor (e.g. a process pool), chunks are categorized there while later ones are parsed.
+        # The staged parts are published only once the fingerprints are committed, and discarded if the file fails.
+        # Parsing and staging run without self.lock, so only the publish and frame swap wait on other jobs;
+        # the store lock is held throughout so the CLI cannot write between dedup and publish.
+        categorizer = categories if isinstance(categories, Categorizer) else Categorizer(categories)
+        handle = open(file, "rb") if isinstance(file, str) else file
+        total_bytes = self.stream_size(handle)
+        chunks = []
+        staged_paths = []
+        in_flight = deque()
+        rows = 0
+        skipped = 0
+        
+        with self.store.lock():
+            with self.lock:
+                self.sync_with_store()
+            session = self.fingerprints.start_session()
+            try:
+                reader = pd.read_csv(
+                    handle,
+                    chunksize = chunk_rows,
+                    dtype = CSV_DTYPES,
+                    usecols = lambda column: column.strip() in CSV_DTYPES
+                )
+                for chunk in timed_iter(reader, "transactions.csv_parse"):
+                    rows += len(chunk)
+                    df = self.clean_transactions(chunk)
+                    skipped += len(chunk) - len(df)
+                    df = session.filter(df[df["Type"].isin(["Sale", "Payment"])])
+                    if on_progress is not None:
+                        on_progress(min(handle.tell() / total_bytes, 1.0) if total_bytes else 1.0, rows)
+                    if df.empty:
+                        continue
+                    
+                    if executor is None:
+                        chunks.append(self.stage_chunk(self.categorize_transactions(df, categorizer), staged_paths))
+                        continue
+                    in_flight.append(executor.submit(TransactionManager.categorize_transactions, df, categorizer))
+                    if len(in_flight) > INGEST_MAX_WORKERS:
+                        chunks.append(self.stage_chunk(in_flight.popleft().result(), staged_paths))
+                while in_flight:
+                    chunks.append(self.stage_chunk(in_flight.popleft().result(), staged_paths))
+            except BaseException:
+                for future in in_flight:
+                    future.cancel()
+                self.store.discard(staged_paths)
+                raise
+            finally:
+                if handle is not file:
+                    handle.close()
+            
+            new_transactions = self.concat_transactions(chunks) if chunks else None
+            with self.lock:
+                report = session.commit()
+                report.skipped = skipped
+                if new_transactions is not None:
+                    self.publish_transactions(new_transactions, staged_paths)
+        metrics.count("rows.read", rows)
+        metrics.count("rows.ingested", report.new)
+        return report
+    
+    def publish_transactions(self, new_transactions, staged_paths):
+        # Called with the store lock and self.lock held, once the fingerprints for these rows are committed.
+        self.store.publish(staged_paths)
+        self.store.compact(self.store.month_keys(new_transactions["Transaction Date"]).unique())
+        self.rollup.add(new_transactions)
+        self.rollup.save()
+        self.fingerprints.save()
+        self.store_version = self.store.bump_version()
+        self.set_transactions(self.concat_transactions([self.transactions, new_transactions]))
+
+    def stage_chunk(self, df, staged_paths):
+        df = compact_transactions(df[STORE_COLUMNS])
+        staged_paths.extend(self.store.stage_partitions(df))
+        return df
+
+    @staticmethod
+    def stream_size(handle):
+        size = getattr(handle, "size", None)
+        if size is None and hasattr(handle, "getbuffer"):
+            size = handle.getbuffer().nbytes
+        if size is None and hasattr(handle, "fileno"):
+            try:
+                size = os.fstat(handle.fileno()).st_size
+            except (OSError, ValueError):
+                size = None
+        return size
+        
+    @staticmethod
+    def concat_transactions(frames):
+        non_empty = [df for df in frames if not df.empty]
+        if len(non_empty) <= 1:
+            return (non_empty or frames)[0].reset_index(drop = True)
+        
+        # Categoricals with different categories would concatenate to object, so each is unioned
+        # across all frames in one pass and the other columns are concatenated once.
+        combined = pd.concat([df.drop(columns = CATEGORICAL_COLUMNS) for df in non_empty], ignore_index = True)
+        for column in CATEGORICAL_COLUMNS:
+            combined[column] = union_categoricals([df[column] for df in non_empty])
+        return combined[non_empty[0].columns]
+    
+    def set_transactions(self, transactions):
+        self.transactions = compact_transactions(transactions[STORE_COLUMNS].reset_index(drop = True))
+        self.touch()
+        
+    def touch(self):
+        self.version += 1
+        self.type_views.clear()
         
-        self.expenses = pd.concat([self.expenses, curr_expenses], ignore_index = True)
-        self.payments = pd.concat([self.payments, curr_payments], ignore_index = True) 
+    def transactions_of_type(self, transaction_type):
+        # Cached per version so every rerun shares one filtered frame instead of re-filtering.
+        # Keyed by version too, since background jobs may replace the frame while the UI reads it.
+        key = (transaction_type, self.version)
+        view = self.type_views.get(key)
+        if view is None:
+            transactions = self.transactions
+            view = transactions.loc[transactions["Type"] == transaction_type, TRANSACTION_DF_COLUMNS]
+            self.type_views[key] = view
+        return view
+    
+    @property
+    def expenses(self):
+        return self.transactions_of_type("Sale")
+    
+    @property
+    def payments(self):
+        return self.transactions_of_type("Payment")
+        
+    def load_transactions_batch(self, files, categories, max_workers = INGEST_MAX_WORKERS):
+        files = list(files)
+        parallel = (
+            max_workers is not None and max_workers > 1 
+            and len(files) >= PARALLEL_INGEST_MIN_FILES
+            and all(isinstance(file, str) for file in files)
+        )
+        if not parallel:
+            return [self.load_transactions(file, categories) for file in files]
         
-    def load_transactions(self, file, categories):
-        df = pd.read_csv(file)
-        cleaned_df = self.clean_transactions(df)
+        # Workers get the static loader, not self, so the loaded history is never pickled.
+        with ProcessPoolExecutor(max_workers = max_workers) as executor:
+            return list(executor.map(
+                partial(TransactionManager.load_transactions, categories = categories),
+                files,
+                chunksize = max(1, len(files) // (max_workers * 4))
+            ))
+        
+    @staticmethod
+    def load_transactions(file, categories):
+        # Returns the categorized rows and how many rows were dropped for having no amount.
+        with metrics.timer("transactions.csv_parse"):
+            df = pd.read_csv(file)
+        cleaned_df = TransactionManager.clean_transactions(df)
 
-        return self.categorize_transactions(cleaned_df, categories)
+        return TransactionManager.categorize_transactions(cleaned_df, categories), len(df) - len(cleaned_df)
         
-    def clean_transactions(self, df):
+    @staticmethod
+    def clean_transactions(df):
+        # Rows with a blank Amount cannot be stored in cents, so they are dropped; callers count them.
         df.columns = [col.strip() for col in df.columns]
-        df["Amount"] = df["Amount"].astype(float)
-        df["Amount"] = df["Amount"].apply(lambda x: x * -1 if x < 0 else x)
+        df = df[df["Amount"].notna()].copy()
+        df["Amount"] = to_cents(df["Amount"].astype(float).abs())
         df["Transaction Date"] = pd.to_datetime(df["Transaction Date"], format="%m/%d/%Y")
         df["Category"] = "Uncategorized"
         
         return df
         
-    def categorize_transactions(self, df, categories):
-        for category, keywords in categories.items():
-            if category == "Uncategorized" or not keywords:
-                continue
-            
-            lowered_keywords = [keyword.lower().strip() for keyword in keywords]
-            
-            for idx, row in df.iterrows():
-                description = row["Description"].lower().strip()
-                if description in lowered_keywords:
-                    df.at[idx, "Category"] = category
+    @staticmethod
+    @instrumented("transactions.categorize")
+    def categorize_transactions(df, categories):
+        categorizer = categories if isinstance(categories, Categorizer) else Categorizer(categories)
+        df["Category"] = categorizer.categorize(df["Description"])
+        metrics.count("rows.categorized", len(df))
                     
         return df
     
-    def separate_transactions(self, df):
-        expenses_df = self.drop_unwanted_columns(df[df["Type"] == "Sale"].copy())
-        payments_df = self.drop_unwanted_columns(df[df["Type"] == "Payment"].copy())
-        
-        return expenses_df, payments_df
-    
-    def drop_unwanted_columns(self, df):
-        return df[TRANSACTION_DF_COLUMNS]
-    
     def has_transactions(self):
         return not self.expenses.empty and not self.payments.empty
     
+    def set_categories(self, labels, categories):
+        with self.lock:
+            self.assign_categories(labels, categories)
+            self.pending_edits.append(
+                self.transactions.loc[labels, EDIT_KEY_COLUMNS + ["Category"]].astype({"Category": object})
+            )
+    
+    def assign_categories(self, labels, categories):
+        # Builds a new frame and swaps it in: background jobs (e.g. the index build) may still be reading the old one.
+        with self.lock:
+            category = self.transactions["Category"].copy()
+            missing = set(categories) - set(category.cat.categories)
+            if missing:
+                category = category.cat.add_categories(sorted(missing))
+            category.loc[labels] = categories
+            self.transactions = self.transactions.assign(Category = category)
+            
+            affected_months = self.store.month_keys(self.transactions.loc[labels, "Transaction Date"]).unique()
+            self.dirty_months.update(affected_months)
+            self.touch()
+            self.rollup.replace_months(self.expenses.assign(Type = "Sale"), affected_months, "Sale")
+    
     def update_expense_transaction(self, idx, new_value):
-        self.expenses.at[idx, "Category"] = new_value
+        self.set_categories([idx], [new_value])
         
-    def get_available_months(self):
-        return [entry.split("_Transactions")[0].replace("_", " ") for entry in os.listdir(PREVIOUS_TRANSACTIONS_PATH)]
-    
-    def retype_transactions(self):
-        expenses_to_save = self.expenses
-        payments_to_save = self.payments
+    def update_expense_categories(self, changes):
+        # changes holds the edited rows (indexed like self.expenses) with their new Category.
+        expenses = self.expenses
+        learned = dict(zip(normalize_descriptions(changes["Description"]), changes["Category"]))
+        new_categories = normalize_descriptions(expenses["Description"]).map(learned).astype(object)
+        new_categories.loc[changes.index] = changes["Category"]
+        
+        affected = new_categories.notna() & (new_categories != expenses["Category"].astype(object))
+        if not affected.any():
+            return 0
         
-        expenses_to_save["Type"] = "Sale"
-        payments_to_save["Type"] = "Payment"
+        self.set_categories(expenses.index[affected], new_categories[affected].to_numpy())
+        return int(affected.sum())
         
-        return pd.concat([expenses_to_save, payments_to_save], ignore_index = True)
+    def recategorize_expenses(self, categories):
+        # Re-applies the current rules to every expense; returns how many rows changed category.
+        expenses = self.expenses
+        if expenses.empty:
+            return 0
+        categorizer = categories if isinstance(categories, Categorizer) else Categorizer(categories)
+        new_categories = categorizer.categorize(expenses["Description"])
+        affected = new_categories != expenses["Category"].astype(object)
+        if not affected.any():
+            return 0
+        
+        self.set_categories(expenses.index[affected], new_categories[affected].to_numpy())
+        return int(affected.sum())
+    
+    def get_available_months(self):
+        return self.store.list_months()
+    
+    @staticmethod
+    def month_label(month):
+        return pd.Period(month, freq = "M").strftime("%B %Y")
+    
+    def load_expenses(self, months):
+        # Served from the in-memory frame: a background save may be rewriting the partitions,
+        # and they lag edits until that save finishes.
+        expenses = self.expenses
+        dates = expenses["Transaction Date"]
+        month_codes = {int(month[:4]) * 100 + int(month[5:]) for month in months}
+        return expenses[(dates.dt.year * 100 + dates.dt.month).isin(month_codes)]
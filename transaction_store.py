@@ -0,0 +1,187 @@
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+from constants import TRANSACTION_STORE_PATH
+from money import to_cents
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+STORE_COLUMNS = ["Transaction Date", "Description", "Amount", "Category", "Type"]
+CATEGORICAL_COLUMNS = ["Description", "Category", "Type"]
+PARTITION_PREFIX = "month="
+MIGRATION_MARKER = ".migrated_from_csv"
+STAGED_SUFFIX = ".staged"
+LOCK_FILENAME = ".lock"
+VERSION_FILENAME = ".version"
+
+def compact_transactions(df):
+    # Amount is int64 cents; repeated strings are categoricals.
+    df = df.copy()
+    if "Amount" in df:
+        df["Amount"] = to_cents(df["Amount"])
+    if "Transaction Date" in df:
+        df["Transaction Date"] = pd.to_datetime(df["Transaction Date"])
+    for column in CATEGORICAL_COLUMNS:
+        if column in df and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    return df
+
+class TransactionStore:
+    """Month-partitioned Parquet files: <root>/month=YYYY-MM/part-*.parquet.
+
+    The app and the CLI may share a store, so writers hold lock() and bump the
+    version stamp; a reader whose stamp is stale reloads before it writes.
+    """
+
+    def __init__(self, root=TRANSACTION_STORE_PATH):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self.lock_path = os.path.join(self.root, LOCK_FILENAME)
+        self.version_path = os.path.join(self.root, VERSION_FILENAME)
+        self.thread_lock = threading.RLock()
+        self.lock_depth = 0
+        self.lock_file = None
+
+    @contextmanager
+    def lock(self):
+        # Reentrant within a process; flock excludes other processes where fcntl is available.
+        with self.thread_lock:
+            if self.lock_depth == 0:
+                self.lock_file = open(self.lock_path, "a")
+                if fcntl is not None:
+                    fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            self.lock_depth += 1
+            try:
+                yield
+            finally:
+                self.lock_depth -= 1
+                if self.lock_depth == 0:
+                    if fcntl is not None:
+                        fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+                    self.lock_file.close()
+                    self.lock_file = None
+
+    def version(self):
+        try:
+            with open(self.version_path, "r") as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def bump_version(self):
+        version = self.version() + 1
+        tmp_path = self.version_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(version))
+        os.replace(tmp_path, self.version_path)
+        return version
+
+    @staticmethod
+    def month_keys(dates):
+        # strftime per row is slow; format each distinct month once and map it back.
+        dates = pd.to_datetime(dates)
+        codes = dates.dt.year * 100 + dates.dt.month
+        return codes.map({code: f"{code // 100:04d}-{code % 100:02d}" for code in codes.dropna().unique()})
+
+    def _partition_dir(self, month):
+        return os.path.join(self.root, f"{PARTITION_PREFIX}{month}")
+
+    def _partition_files(self, month):
+        partition_dir = self._partition_dir(month)
+        if not os.path.isdir(partition_dir):
+            return []
+        return sorted(
+            os.path.join(partition_dir, entry)
+            for entry in os.listdir(partition_dir)
+            if entry.endswith(".parquet")
+        )
+
+    def list_months(self):
+        return sorted(
+            entry[len(PARTITION_PREFIX):]
+            for entry in os.listdir(self.root)
+            if entry.startswith(PARTITION_PREFIX) and self._partition_files(entry[len(PARTITION_PREFIX):])
+        )
+
+    def load(self, months=None, filters=None):
+        available_months = self.list_months()
+        if months is not None:
+            available_months = [month for month in available_months if month in set(months)]
+
+        frames = [
+            pd.read_parquet(path, filters=filters)
+            for month in available_months
+            for path in self._partition_files(month)
+        ]
+        if not frames:
+            return compact_transactions(pd.DataFrame(columns=STORE_COLUMNS))
+        return compact_transactions(pd.concat(frames, ignore_index=True))
+
+    def write_partitions(self, df, months=None):
+        monthly_groups = {
+            month: group
+            for month, group in df.groupby(self.month_keys(df["Transaction Date"]))
+        }
+        # A month asked for but absent from df has had all its rows removed.
+        for month in (monthly_groups.keys() if months is None else months):
+            self._replace_partition(month, monthly_groups.get(month))
+
+    def stage_partitions(self, df):
+        # Staged parts are invisible to load() until publish(), so a failed ingest can discard them.
+        staged_paths = []
+        for month, group in df.groupby(self.month_keys(df["Transaction Date"])):
+            partition_dir = self._partition_dir(month)
+            os.makedirs(partition_dir, exist_ok=True)
+            staged_paths.append(self._write_part(partition_dir, group, STAGED_SUFFIX))
+        return staged_paths
+
+    @staticmethod
+    def publish(staged_paths):
+        for path in staged_paths:
+            os.replace(path, path[:-len(STAGED_SUFFIX)])
+
+    @staticmethod
+    def discard(staged_paths):
+        for path in staged_paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def compact(self, months):
+        for month in months:
+            if len(self._partition_files(month)) > 1:
+                self._replace_partition(month, self.load(months=[month]))
+
+    def _replace_partition(self, month, df):
+        partition_dir = self._partition_dir(month)
+        if df is None or df.empty:
+            shutil.rmtree(partition_dir, ignore_errors=True)
+            return
+
+        os.makedirs(partition_dir, exist_ok=True)
+        old_files = self._partition_files(month)
+        self._write_part(partition_dir, df)
+        for path in old_files:
+            os.remove(path)
+
+    @staticmethod
+    def _write_part(partition_dir, df, suffix=""):
+        part_path = os.path.join(partition_dir, f"part-{uuid.uuid4().hex}.parquet{suffix}")
+        tmp_path = part_path + ".tmp"
+        df[STORE_COLUMNS].reset_index(drop=True).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, part_path)
+        return part_path
+
+    def needs_migration(self, csv_dir):
+        return os.path.isdir(csv_dir) and not os.path.exists(os.path.join(self.root, MIGRATION_MARKER))
+
+    def mark_migrated(self):
+        with open(os.path.join(self.root, MIGRATION_MARKER), "w") as f:
+            f.write("")